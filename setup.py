@@ -24,6 +24,7 @@ setup(
     keywords="search embedding machine-learning nlp",
     python_requires=">=3.10",
     install_requires=["httpx>=0.28.1", "huggingface-hub>=0.34.0", "pyyaml>=5.3", "txtai[agent]>=9.5.0", "websockets>=16.0"],
+    extras_require={"http2": ["httpx[http2]>=0.28.1"], "json": ["orjson>=3.9"]},
     classifiers=[
         "License :: OSI Approved :: Apache Software License",
         "Operating System :: OS Independent",
@@ -3,3 +3,7 @@ Agent imports
 """
 
 from .base import Agent
+from .host import Host
+from .models import Models
+from .personas import Personas
+from .sessions import History, Sessions
@@ -2,23 +2,46 @@
 Main agent execution method
 """
 
+import argparse
 import logging
-import sys
+import os
+
+from ..tracing import tracer
 
 from .base import Agent
+from .host import Host
+from .personas import Personas
 
 
 if __name__ == "__main__":
-    if len(sys.argv) <= 1:
-        print("Usage: agent <path to config yml>")
-        sys.exit()
+    parser = argparse.ArgumentParser(prog="agent", description="Runs txtchat personas")
+    parser.add_argument("paths", nargs="+", help="path to config yml or persona name")
+    parser.add_argument("--prefetch", action="store_true", help="cache personas along with referenced models and indexes, then exit")
+    parser.add_argument("--offline", action="store_true", help="never use the network, personas and models must already be cached")
+    parser.add_argument("--cache", help="persona cache directory")
+    args = parser.parse_args()
 
-    # Configure logging
-    logging.basicConfig(format="%(asctime)s [%(levelname)s] %(funcName)s: %(message)s")
+    # Configure logging, log records include message trace correlation ids
+    tracer.install()
+    logging.basicConfig(format="%(asctime)s [%(levelname)s] [%(trace)s] %(funcName)s: %(message)s")
     logging.getLogger().setLevel(logging.INFO)
 
-    # Load agent
-    agent = Agent(sys.argv[1])
+    # Persona cache settings are passed through the environment to agents and worker processes
+    if args.cache:
+        os.environ["TXTCHAT_CACHE"] = args.cache
+
+    personas = Personas(offline=True if args.offline else None)
+
+    if args.prefetch:
+        # Cache personas and exit
+        for path in args.paths:
+            personas.prefetch(path)
+    else:
+        # Load agent, multiple personas run in a single host process
+        agent = Agent(args.paths[0]) if len(args.paths) == 1 else Host(args.paths)
 
-    # Run agent
-    agent()
+        # Run agent, then stop worker processes and release resources on shutdown
+        try:
+            agent()
+        finally:
+            agent.close()
@@ -0,0 +1,163 @@
+"""
+Application module
+"""
+
+import logging
+
+from txtai import Application
+from txtai.pipeline import PipelineFactory
+
+# Logging configuration
+logger = logging.getLogger(__name__)
+
+
+class SharedApplication(Application):
+    """
+    txtai application that shares loaded embeddings indexes and pipelines with other applications through a Models registry.
+
+    Read-only embeddings indexes are shared when the index path, cloud and embeddings settings match. Pipelines are shared when
+    the pipeline configuration matches. Pipelines that reference the application, reference other pipelines by name or depend on
+    an embeddings index that isn't shared are always loaded per application.
+    """
+
+    # Pipelines that use the embeddings index
+    DEPENDENT = ["extractor", "rag"]
+
+    def __init__(self, config, models):
+        """
+        Creates a new SharedApplication.
+
+        Args:
+            config: application configuration
+            models: Models registry
+        """
+
+        self.models = models
+
+        # Build registry keys from the original configuration. The configuration is modified when the application is created.
+        config = Application.read(config)
+        self.keys = self.sharedkeys(config)
+
+        super().__init__(config)
+
+    def createpipelines(self):
+        """
+        Create pipelines. Reuses pipelines already loaded by other applications.
+        """
+
+        with self.models.lock:
+            # Remove pipelines already loaded by another application from the configuration
+            shared = {}
+            for name, key in self.keys["pipelines"].items():
+                if key in self.models.pipelines:
+                    shared[name] = (self.config.pop(name), self.models.pipelines[key])
+                    logger.info("Sharing loaded pipeline: %s", name)
+
+            # Create remaining pipelines
+            super().createpipelines()
+
+            # Restore configuration and add shared pipelines
+            for name, (config, pipeline) in shared.items():
+                if name in SharedApplication.DEPENDENT:
+                    config.setdefault("similarity", None)
+
+                self.config[name] = config
+                self.pipelines[name] = pipeline
+
+            # Register newly loaded pipelines
+            for name, key in self.keys["pipelines"].items():
+                if name not in shared and name in self.pipelines:
+                    self.models.pipelines[key] = self.pipelines[name]
+
+    def indexes(self, loaddata):
+        """
+        Initialize an embeddings index. Reuses the index when already loaded by another application.
+
+        Args:
+            loaddata: If True (default), load existing index data, if available. Otherwise, only load models.
+        """
+
+        key = self.keys["embeddings"]
+
+        with self.models.lock:
+            if loaddata and key in self.models.embeddings:
+                logger.info("Sharing loaded embeddings index: %s", self.config.get("path"))
+
+                # Share embeddings and the lock that guards it
+                # pylint: disable=W0201
+                self.embeddings, self.lock = self.models.embeddings[key]
+
+                # Attach embeddings to pipelines
+                for name in SharedApplication.DEPENDENT:
+                    pipeline, config = self.pipelines.get(name), self.config.get(name)
+                    if pipeline and config is not None and config.get("similarity") is None:
+                        pipeline.similarity = self.embeddings
+
+                if "reranker" in self.pipelines:
+                    self.pipelines["reranker"].embeddings = self.embeddings
+
+            else:
+                super().indexes(loaddata)
+
+                # Register loaded index
+                if loaddata and key and self.embeddings:
+                    self.models.embeddings[key] = (self.embeddings, self.lock)
+
+    def sharedkeys(self, config):
+        """
+        Builds registry keys for the embeddings index and pipelines that can be shared.
+
+        Args:
+            config: application configuration
+
+        Returns:
+            {"embeddings": key or None, "pipelines": {name: key}}
+        """
+
+        embeddings = config.get("embeddings") or {}
+
+        # Only share read-only indexes loaded from a path, application functions are bound to a single application
+        key = None
+        if config.get("path") and not config.get("writable") and not any(x in embeddings for x in ["functions", "transform"]):
+            key = self.models.key(config.get("path"), config.get("cloud"), embeddings)
+
+        # Pipeline names in this configuration
+        pipelines = PipelineFactory.list()
+        names = [name for name in config if name in pipelines or "." in name]
+        names = [name for name in names if isinstance(config[name], (dict, type(None)))]
+
+        # Pipelines referenced by name from other pipelines
+        references = {value for name in names for value in (config[name] or {}).values() if isinstance(value, str) and value in names}
+
+        pipelines = {}
+        for name in names:
+            if self.shareable(name, config[name] or {}, names, references, key):
+                pipelines[name] = self.models.key(name, config[name] or {}, key if name in SharedApplication.DEPENDENT else None)
+
+        return {"embeddings": key, "pipelines": pipelines}
+
+    def shareable(self, name, config, names, references, embeddings):
+        """
+        Checks if a pipeline can be shared with other applications.
+
+        Args:
+            name: pipeline name
+            config: pipeline configuration
+            names: pipeline names in the application configuration
+            references: pipeline names referenced by other pipelines
+            embeddings: embeddings registry key, None if the embeddings index isn't shared
+
+        Returns:
+            True if the pipeline can be shared
+        """
+
+        # Pipelines bound to the application or to other pipelines
+        if "application" in config or name in references or any(isinstance(value, str) and value in names for value in config.values()):
+            return False
+
+        # Reranker is bound to the similarity pipeline
+        if name == "reranker":
+            return False
+
+        # Pipelines that use the embeddings index require a shared index
+        return name not in SharedApplication.DEPENDENT or (embeddings is not None and config.get("similarity") is None)
@@ -2,16 +2,33 @@
 Agent module
 """
 
+import functools
+import inspect
 import logging
 import os
+import signal
+import threading
+import time
 import traceback
 
-import huggingface_hub
+from collections import deque
+
 import yaml
 
 from txtai import Application
 
+from ..cache import Cache, CacheFactory, SemanticCache
 from ..chat import ChatFactory
+from ..metrics import MetricsServer, registry
+from ..pipeline import Wikisearch
+from ..tracing import profiler, tracer
+
+from .application import SharedApplication
+from .batch import Batch
+from .models import Models
+from .personas import Personas
+from .sessions import Sessions
+from .workers import Workers
 
 # Logging configuration
 logger = logging.getLogger(__name__)
@@ -23,55 +40,438 @@ class Agent:
     the type of generated AI-powered responses to user messages.
     """
 
-    def __init__(self, path):
+    # Agent settings that don't change responses
+    OPERATIONAL = ["batch", "cache", "connection", "metrics", "processes", "reload", "sessions", "startup", "stream", "trace", "workers"]
+
+    def __init__(self, path, models=None, chat=True):
         """
         Create a new agent.
 
         Args:
-            path: path to configuration file
+            path: path to configuration file or configuration dictionary
+            models: optional Models registry used to share loaded models and indexes with other agents
+            chat: create a chat provider if True (default), otherwise this agent only executes actions
         """
 
-        # Load configuration
+        # Load configuration, the configuration source is kept to reload the persona
+        self.source = path if isinstance(path, str) else None
         self.config = self.load(path)
 
+        # Configuration hash, computed before the application adds runtime objects to the configuration. Only settings that change
+        # responses are hashed, so operational changes keep cached responses.
+        self.namespace = Cache.namespace({k: v for k, v in self.config.items() if k not in Agent.OPERATIONAL})
+
+        # Application state
+        self.application, self.workers, self.batch, self.cache, self.semantic = None, None, None, None, None
+        # Action is resolved from the configuration, so it's available to the chat connection before the application loads
+        self.action, self.task = self.resolve()
+
+        # Startup time and readiness
+        self.started, self.ready = time.time(), threading.Event()
+
+        # Models registry, reloading the persona reuses loaded models and indexes through a registry
+        self.models = models if models else Models() if self.config.get("reload") else None
+
+        # Current persona version, replaced when the configuration is reloaded
+        self.current, self.lock = self, threading.Lock()
+
+        if chat and self.config.get("processes"):
+            # Run actions in worker processes, each worker process loads its own application
+            config = self.config["processes"] if isinstance(self.config["processes"], dict) else {}
+            self.workers = Workers(
+                type(self),
+                {k: v for k, v in self.config.items() if k not in ["processes", "stream", "metrics"]},
+                config.get("count", 2),
+                config.get("affinity", True),
+                config.get("interval", 5.0),
+                config.get("timeout", 300.0),
+            )
+
+            self.task = "workers"
+            self.ready.set()
+
+        elif chat and self.config.get("startup"):
+            # Load application in the background while the chat connection starts
+            threading.Thread(target=self.startup, args=(self.models, chat), name="startup", daemon=True).start()
+
+        else:
+            # Create application in this process
+            self.startup(self.models, chat)
+
+        # Load chat provider
+        self.chat = ChatFactory.create(self.connection(), self.execute) if chat else None
+
+    def __call__(self):
+        """
+        Run this agent.
+        """
+
+        logger.info("Starting agent")
+
+        # Start metrics endpoint, if enabled
+        self.metrics()
+
+        # Reload persona when the configuration changes or on SIGHUP, if enabled
+        if self.watch() and hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self.hangup)
+
+        # Trace messages and profile the next actions on SIGUSR1, if enabled
+        if self.tracing() and hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, self.profile)
+
+        # Run chat loop
+        self.chat.run()
+
+    def startup(self, models, chat=False):
+        """
+        Creates the application, runs an optional warm-up request and marks this agent as ready.
+
+        Args:
+            models: optional Models registry used to share loaded models and indexes with other agents
+            chat: True if this agent runs the chat connection. Its application is registered with the models registry and, when
+                  reloading is enabled, held by a separate version that is replaced on reload.
+        """
+
+        config = self.config["startup"] if isinstance(self.config.get("startup"), dict) else {}
+
+        # pylint: disable=W0703
+        try:
+            if chat and self.config.get("reload"):
+                # Create the first version, the application is only referenced by the version so it can be released on reload
+                self.current = type(self)(self.config, models, chat=False)
+                self.action, self.task = self.current.action, self.current.task
+            else:
+                # Create application in this process
+                self.create(models)
+
+                # Run warm-up request
+                if config.get("warmup"):
+                    response = self.process(config["warmup"])
+                    if inspect.isgenerator(response):
+                        list(response)
+
+                elapsed = time.time() - self.started
+                logger.info("Agent ready in %.2f seconds", elapsed)
+
+                registry.gauge("txtchat_startup_seconds", elapsed, action=self.action)
+                registry.gauge("txtchat_ready_timestamp_seconds", time.time(), action=self.action)
+
+            # Register the application in use, models not used by any registered application are released on reload
+            if chat and models:
+                models.use(self, self.current.application)
+
+        except Exception:
+            logger.error(traceback.format_exc())
+
+        finally:
+            # Release waiting requests, requests fail with an error response if the application failed to load
+            self.ready.set()
+
+    def create(self, models):
+        """
+        Creates the txtai application and resolves the action to execute for each message.
+
+        Args:
+            models: optional Models registry used to share loaded models and indexes with other agents
+        """
+
         # Create a txtai application instance
-        self.application = Application(self.config)
+        self.application = SharedApplication(self.config, models) if models else Application(self.config)
+
+        # Get action to execute
+        self.action, self.task = self.resolve()
+
+        # Record a trace span for each workflow task, if tracing is enabled
+        if self.task == "workflow" and self.config.get("trace"):
+            for x, task in enumerate(self.application.workflows[self.action].tasks):
+                task.action = [tracer.wrap(f"task{x}", action) for action in task.action]
+
+        # Label pipeline timings and time agent LLM calls
+        self.instrument()
+
+        # Bound agent conversation memory
+        if self.task == "agent":
+            self.sessions()
+
+        # Batch concurrent workflow requests, if enabled
+        if self.task == "workflow" and self.config.get("batch"):
+            config = self.config["batch"] if isinstance(self.config["batch"], dict) else {}
+            self.batch = Batch(self.workflow, config.get("size", 16), config.get("window", 0.02))
+
+        # Cache workflow responses, if enabled
+        if self.task == "workflow" and self.config.get("cache"):
+            config = self.config["cache"] if isinstance(self.config["cache"], dict) else {}
+            self.cache = CacheFactory.create(config)
+
+            # Semantic cache matches similar questions using the application embeddings model
+            if config.get("semantic"):
+                if self.application.embeddings:
+                    semantic = config["semantic"] if isinstance(config["semantic"], dict) else {}
+                    self.semantic = SemanticCache(semantic, self.application.transform)
+                else:
+                    logger.warning("Semantic cache requires an embeddings index, skipping")
+
+    def resolve(self):
+        """
+        Resolves the action to execute for each message. Application workflows and agents are named by their configuration
+        sections, so the action is resolved without loading the application.
+
+        Returns:
+            (action, task)
+        """
 
         # Get action, if available
         action = self.config.get("action")
+        workflows, agents = self.config.get("workflow") or {}, self.config.get("agent") or {}
 
         # Workflow action
-        if action in self.application.workflows:
-            self.action, self.task = action, "workflow"
+        if action in workflows:
+            return action, "workflow"
 
         # Agent action
-        elif action in self.application.agents:
-            self.action, self.task = action, "agent"
+        if action in agents:
+            return action, "agent"
 
         # Default workflow action
-        elif self.application.workflows:
-            self.action, self.task = list(self.application.workflows.keys())[0], "workflow"
+        if workflows:
+            return list(workflows.keys())[0], "workflow"
 
         # Default agent action
-        else:
-            self.action, self.task = list(self.application.agents.keys())[0], "agent"
+        return (list(agents.keys())[0] if agents else action), "agent"
 
-        # Load chat provider
-        self.chat = ChatFactory.create(self.connection(), self.execute)
+    def instrument(self):
+        """
+        Labels Wikisearch pipeline timings with the chat provider and action. Agent LLM calls are timed with the same labels.
+        """
 
-    def __call__(self):
+        labels = {"provider": ChatFactory.provider(self.connection()), "action": self.action}
+
+        # Pipeline timings
+        for pipeline in self.application.pipelines.values():
+            if isinstance(pipeline, Wikisearch):
+                pipeline.labels.update(labels)
+
+        # Agent LLM timings
+        if self.task == "agent":
+            model = self.application.agents[self.action].process.model
+            generate = model.generate
+
+            @functools.wraps(generate)
+            def timer(*args, **kwargs):
+                with registry.timer("txtchat_llm_seconds", **labels), tracer.span("llm"):
+                    return generate(*args, **kwargs)
+
+            model.generate = timer
+
+    def sessions(self):
         """
-        Run this agent.
+        Replaces agent memory with a bounded session store, if the agent keeps conversation memory.
         """
 
-        logger.info("Starting agent")
+        agent = self.application.agents[self.action]
+        if agent.window:
+            config = self.config["sessions"] if isinstance(self.config.get("sessions"), dict) else {}
+            agent.memory = Sessions(config, agent.window, self.config.get("maxlength", 8192), self.action)
 
-        # Run chat loop
-        self.chat.run()
+    def watch(self):
+        """
+        Starts watching the configuration file for changes, if enabled.
+
+        Returns:
+            True if reloading is enabled
+        """
+
+        if not self.config.get("reload") or not self.source:
+            return False
+
+        if self.workers:
+            logger.warning("Reloading isn't supported with worker processes")
+            return False
+
+        # Poll configuration file modification time
+        config = self.config["reload"] if isinstance(self.config["reload"], dict) else {}
+        if config.get("watch", True) and os.path.exists(self.source):
+            threading.Thread(target=self.poll, args=(config.get("interval", 2.0),), name="watch", daemon=True).start()
+
+        return True
+
+    def poll(self, interval):
+        """
+        Reloads the persona each time the configuration file changes.
+
+        Args:
+            interval: polling interval in seconds
+        """
+
+        modified = os.path.getmtime(self.source)
+        while True:
+            time.sleep(interval)
+
+            # File can be missing while it's being replaced
+            try:
+                current = os.path.getmtime(self.source)
+            except OSError:
+                continue
+
+            if current != modified:
+                modified = current
+                self.reload()
+
+    # pylint: disable=W0613
+    def hangup(self, *args):
+        """
+        Reloads the persona in a background thread. This method is used as the SIGHUP handler.
+
+        Args:
+            args: signal handler arguments
+        """
+
+        threading.Thread(target=self.reload, name="reload", daemon=True).start()
+
+    def reload(self):
+        """
+        Reloads the persona configuration. A new version of the application is created, reusing loaded models and indexes when
+        their configuration is unchanged. The new version replaces the current version once it's ready. Requests in progress
+        finish on the previous version.
+        """
+
+        with self.lock:
+            # Wait for the initial application to load
+            self.ready.wait()
+
+            # pylint: disable=W0703
+            try:
+                config = self.load(self.source)
+                if config.get("connection") != self.config.get("connection"):
+                    logger.warning("Connection changes require a restart, keeping current connection")
+
+                # Create new version without a chat connection
+                current = type(self)(config, self.models, chat=False)
+                if not current.application:
+                    logger.error("Failed to reload %s, keeping current version", self.source)
+                    return
+
+                # Keep conversation history
+                self.history(self.current, current)
+
+                # Swap versions
+                previous, self.current = self.current, current
+                previous.close()
+
+                # Release models only used by the previous version, the registry can be shared with other agents
+                self.models.use(self, current.application)
+                self.models.prune()
+
+                registry.increment("txtchat_reloads_total", action=self.action)
+                logger.info("Reloaded %s", self.source)
+
+            except Exception:
+                logger.error(traceback.format_exc())
+
+    def history(self, previous, current):
+        """
+        Copies agent conversation history from the previous version to the current version.
+
+        Args:
+            previous: previous version
+            current: current version
+        """
+
+        if previous.task == current.task == "agent" and previous.action == current.action:
+            source, target = previous.application.agents[previous.action], current.application.agents[current.action]
+            if target.window:
+                for session in list(source.memory):
+                    # Sessions can expire while copying
+                    memory = source.memory.get(session)
+                    if memory is not None:
+                        target.memory[session] = deque(memory, maxlen=target.window)
+
+    def close(self):
+        """
+        Releases resources held by this agent or version. Requests in progress on a version are allowed to finish, worker
+        processes are stopped.
+        """
+
+        if self.batch:
+            self.batch.close()
+
+        if self.workers:
+            self.workers.close()
+
+        # Close the current version, reloaded agents hold their application in a separate version
+        if self.current is not self:
+            self.current.close()
+
+    def tracing(self):
+        """
+        Starts tracing messages, if enabled.
+
+        Returns:
+            True if tracing is enabled
+        """
+
+        if self.config.get("trace"):
+            tracer.configure(self.config["trace"] if isinstance(self.config["trace"], dict) else {})
+            return True
+
+        return False
+
+    # pylint: disable=W0613
+    def profile(self, *args):
+        """
+        Profiles the next actions. Called when the process receives SIGUSR1.
+
+        Args:
+            args: signal handler arguments
+        """
+
+        config = self.config["trace"] if isinstance(self.config.get("trace"), dict) else {}
+        config = config["profile"] if isinstance(config.get("profile"), dict) else {}
+
+        profiler.start(config.get("count", 10), config.get("path"))
+
+    def metrics(self):
+        """
+        Starts the metrics endpoint, if enabled.
+
+        Returns:
+            True if the metrics endpoint was started
+        """
+
+        if self.config.get("metrics"):
+            config = self.config["metrics"] if isinstance(self.config["metrics"], dict) else {}
+            MetricsServer(config.get("host", "0.0.0.0"), config.get("port", 9100)).start()
+            return True
+
+        return False
 
     def execute(self, text, **kwargs):
         """
-        Executes an Agent task with message text as input.
+        Executes an Agent task with message text as input. Requests received while the application is loading either wait or
+        receive the configured startup message.
+
+        Args:
+            text: input text
+            kwargs: additional keyword arguments
+
+        Returns:
+            message response
+        """
+
+        if not self.ready.is_set():
+            config = self.config["startup"] if isinstance(self.config.get("startup"), dict) else {}
+            if config.get("message"):
+                return config["message"]
+
+            # Wait for application to load
+            self.ready.wait()
+
+        # Run on the current persona version, requests keep this version until they finish
+        return self.current.process(text, **kwargs)
+
+    def process(self, text, **kwargs):
+        """
+        Runs the Agent task for message text.
 
         Args:
             text: input text
@@ -84,19 +484,114 @@ class Agent:
         # pylint: disable=W0703
         try:
             # Execute action
-            if self.task == "workflow":
-                # Execute workflow for input message text
-                response = list(self.application.workflow(self.action, [text]))[0]
+            if self.task == "workers":
+                # Execute action in a worker process
+                with tracer.span("workers"):
+                    response = self.workers(text, **kwargs)
+
+            elif self.task == "workflow":
+                with tracer.span("cache"):
+                    # Check for a cached response
+                    key = Cache.key(self.action, text, self.namespace) if self.cache else None
+                    response = self.cache.get(key) if self.cache else None
+                    if self.cache:
+                        registry.increment("txtchat_cache_requests_total", cache="response", result=self.result(response), action=self.action)
+
+                    # Check for a cached response to a similar question, the question vector is reused to cache the response
+                    vector = None
+                    if response is None and self.semantic:
+                        vector = self.semantic.vector(text)
+                        response = self.semantic.get(vector)
+                        registry.increment("txtchat_cache_requests_total", cache="semantic", result=self.result(response), action=self.action)
+
+                if response is None:
+                    # Execute workflow for input message text
+                    response = self.batch(text) if self.batch else self.workflow([text])[0]
+
+                    # Cache response
+                    if self.cache:
+                        self.cache.put(key, response)
+
+                    if self.semantic:
+                        self.semantic.put(vector, response)
+            elif self.config.get("stream"):
+                # Stream agent output for input message text
+                response = self.stream(text, **kwargs)
+
             else:
                 # Execute agent for input message text
-                response = self.application.agent(self.action, text, self.config.get("maxlength", 8192), **kwargs)
+                with tracer.span("agent"):
+                    response = self.application.agent(self.action, text, self.config.get("maxlength", 8192), **kwargs)
 
         except Exception:
             response = "I had an error processing this request"
+            registry.increment("txtchat_errors_total", stage="execute", action=self.action)
             logger.error(traceback.format_exc())
 
         return response
 
+    def stream(self, text, **kwargs):
+        """
+        Executes an Agent task and streams the output. Model output from planning and tool calling steps is intermediate work,
+        only the final answer is sent.
+
+        Args:
+            text: input text
+            kwargs: additional keyword arguments
+
+        Returns:
+            generator of partial responses
+        """
+
+        output = ""
+
+        # pylint: disable=W0703
+        try:
+            for event in self.application.agent(self.action, text, self.config.get("maxlength", 8192), stream=True, **kwargs):
+                # Skip model output deltas and other agent step events
+                if type(event).__name__ == "FinalAnswerStep":
+                    # Older agent versions name this field final_answer
+                    output = str(getattr(event, "output", getattr(event, "final_answer", output)))
+                    yield output
+
+        except Exception:
+            output = "I had an error processing this request"
+            registry.increment("txtchat_errors_total", stage="execute", action=self.action)
+            logger.error(traceback.format_exc())
+
+            yield output
+
+        # Replace the output generator stored in agent memory with the final text
+        memory = self.application.agents[self.action].memory.get(kwargs.get("session"))
+        if memory:
+            memory[-1] = (text, output)
+
+    def workflow(self, texts):
+        """
+        Runs the workflow action for a list of input texts.
+
+        Args:
+            texts: list of input texts
+
+        Returns:
+            list of responses
+        """
+
+        return list(self.application.workflow(self.action, texts))
+
+    def result(self, response):
+        """
+        Gets the cache result label for a cache lookup.
+
+        Args:
+            response: cached response or None
+
+        Returns:
+            hit or miss
+        """
+
+        return "miss" if response is None else "hit"
+
     def connection(self):
         """
         Reads agent connection parameters. This method also supports parameters as environment variables.
@@ -108,26 +603,39 @@ class Agent:
         # Get agent connection parameters
         config = self.config.get("connection", {})
 
-        # Get parameters from config. If empty check environment variables
-        return {x: config.get(x, os.environ.get(f"AGENT_{x.upper()}")) for x in ["url", "username", "password", "token", "provider"]}
+        # Get parameters from config. If empty check environment variables. Additional provider settings are passed through.
+        connection = {
+            "name": self.action,
+            **config,
+            **{x: config.get(x, os.environ.get(f"AGENT_{x.upper()}")) for x in ["url", "username", "password", "token", "provider"]},
+        }
+
+        # Each batched request holds an action worker while it waits, default to enough workers to fill a batch
+        if self.config.get("batch") and not config.get("workers"):
+            batch = self.config["batch"] if isinstance(self.config["batch"], dict) else {}
+            connection["workers"] = max(batch.get("size", 16), 4)
+
+        return connection
 
     def load(self, path):
         """
-        Loads configuration from path. If path doesn't exist, check with project on HF Hub.
+        Loads configuration from path. If path doesn't exist, the persona is read from the local persona cache or downloaded from
+        the HF Hub project.
 
         Args:
-            path: path to configuration
+            path: path to configuration or configuration dictionary
 
         Returns:
             configuration
         """
 
-        # Check Hugging Face Hub for configuration
+        # Configuration is already loaded
+        if isinstance(path, dict):
+            return path
+
+        # Check local persona cache, then Hugging Face Hub for configuration
         if not os.path.exists(path):
-            path = huggingface_hub.hf_hub_download(
-                repo_id="neuml/txtchat-personas",
-                filename=os.path.basename(path),
-            )
+            path = Personas().resolve(path)
 
         # Read yaml from file
         with open(path, "r", encoding="utf-8") as f:
@@ -0,0 +1,130 @@
+"""
+Batch module
+"""
+
+import queue
+import threading
+import time
+
+from concurrent.futures import Future
+
+from ..tracing import tracer
+
+
+class Batch:
+    """
+    Collects concurrent requests into micro-batches. Requests arriving within a short window are run through a single function call,
+    which is much cheaper per element for embeddings queries and model inference.
+    """
+
+    def __init__(self, function, size=16, window=0.02):
+        """
+        Creates a new Batch instance.
+
+        Args:
+            function: function that takes a list of elements and returns a list of results in the same order
+            size: maximum number of elements per batch
+            window: maximum time in seconds to wait for additional elements after the first one arrives
+        """
+
+        self.function = function
+        self.size = size
+        self.window = window
+
+        # Pending (element, future, traces) requests
+        self.queue = queue.Queue()
+
+        # Set when closed, requests arriving after close run without batching
+        self.closed, self.lock = False, threading.Lock()
+
+        # Start batch processing thread
+        self.thread = threading.Thread(target=self.run, name="batch", daemon=True)
+        self.thread.start()
+
+    def __call__(self, element):
+        """
+        Adds element to the next batch and waits for the result.
+
+        Args:
+            element: input element
+
+        Returns:
+            result for element
+        """
+
+        future = Future()
+        with self.lock:
+            closed = self.closed
+            if not closed:
+                self.queue.put((element, future, tracer.traces()))
+
+        return self.function([element])[0] if closed else future.result()
+
+    def close(self):
+        """
+        Stops the batch processing thread once pending elements are processed. Elements added after close run on their own.
+        """
+
+        with self.lock:
+            self.closed = True
+            self.queue.put(None)
+
+    def run(self):
+        """
+        Batch processing loop.
+        """
+
+        while True:
+            # Block until the first element of a batch arrives
+            request = self.queue.get()
+            if request is None:
+                break
+
+            batch = [request]
+
+            # Collect additional elements until the window closes or the batch is full
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+
+                try:
+                    request = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+
+                # Stop after this batch
+                if request is None:
+                    self.queue.put(None)
+                    break
+
+                batch.append(request)
+
+            self.execute(batch)
+
+    def execute(self, batch):
+        """
+        Runs function for a batch and resolves each request with its result. When a batch fails, each element is retried on its
+        own so that one failing element doesn't fail the whole batch.
+
+        Args:
+            batch: list of (element, future, traces)
+        """
+
+        elements, futures, traces = zip(*batch)
+
+        # pylint: disable=W0703
+        try:
+            # Spans recorded while running the batch are added to the traces of all elements
+            with tracer.activate(*(trace for group in traces for trace in group)):
+                results = self.function(list(elements))
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+        except Exception as e:
+            if len(batch) > 1:
+                for request in batch:
+                    self.execute([request])
+            else:
+                futures[0].set_exception(e)
@@ -0,0 +1,76 @@
+"""
+Host module
+"""
+
+import asyncio
+import logging
+import signal
+
+from .base import Agent
+from .models import Models
+
+# Logging configuration
+logger = logging.getLogger(__name__)
+
+
+class Host:
+    """
+    Runs multiple personas in a single process. Each persona's chat connection runs as a separate task on a single event loop.
+    Loaded models and embeddings indexes are shared across personas when their configuration matches.
+    """
+
+    def __init__(self, paths):
+        """
+        Creates a new Host.
+
+        Args:
+            paths: list of persona configuration paths
+        """
+
+        # Shared models and indexes
+        self.models = Models()
+
+        # Create agents
+        self.agents = [Agent(path, self.models) for path in paths]
+
+    def __call__(self):
+        """
+        Runs all personas.
+        """
+
+        logger.info("Starting %d agents", len(self.agents))
+
+        # Start metrics endpoint with the first persona that enables it, metrics for all personas are shared
+        for agent in self.agents:
+            if agent.metrics():
+                break
+
+        # Reload personas when their configuration changes or on SIGHUP, if enabled
+        agents = [agent for agent in self.agents if agent.watch()]
+        if agents and hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda *args: [agent.hangup() for agent in agents])
+
+        # Trace messages with the first persona that enables it, tracing and profiling settings apply to all personas
+        for agent in self.agents:
+            if agent.tracing():
+                if hasattr(signal, "SIGUSR1"):
+                    signal.signal(signal.SIGUSR1, agent.profile)
+                break
+
+        # Run chat loops
+        asyncio.run(self.loop())
+
+    def close(self):
+        """
+        Releases resources held by all personas.
+        """
+
+        for agent in self.agents:
+            agent.close()
+
+    async def loop(self):
+        """
+        Main processing loop. Runs each persona chat loop as a separate task.
+        """
+
+        await asyncio.gather(*(agent.chat.loop() for agent in self.agents))
@@ -0,0 +1,70 @@
+"""
+Models module
+"""
+
+import json
+import threading
+
+
+class Models:
+    """
+    Registry of loaded embeddings indexes and pipelines. Applications that share a registry reuse models and indexes when their
+    configuration matches, instead of loading another copy.
+    """
+
+    def __init__(self):
+        """
+        Creates a new Models registry.
+        """
+
+        # key -> (embeddings, lock)
+        self.embeddings = {}
+
+        # key -> pipeline
+        self.pipelines = {}
+
+        # owner -> application currently used by that owner
+        self.applications = {}
+
+        # Serialize registry updates
+        self.lock = threading.RLock()
+
+    def key(self, *args):
+        """
+        Builds a registry key from configuration values.
+
+        Args:
+            args: configuration values
+
+        Returns:
+            key
+        """
+
+        return json.dumps(args, sort_keys=True, default=str)
+
+    def use(self, owner, application):
+        """
+        Sets the application currently used by an owner, such as an agent. Replaces the owner's previous application.
+
+        Args:
+            owner: application owner
+            application: application, None if the application failed to load
+        """
+
+        with self.lock:
+            self.applications[owner] = application
+
+    def prune(self):
+        """
+        Removes models and indexes that aren't used by any current application. Removed models are released once applications
+        still running requests finish with them.
+        """
+
+        with self.lock:
+            applications = [application for application in self.applications.values() if application]
+
+            embeddings = {application.keys["embeddings"] for application in applications}
+            pipelines = {key for application in applications for key in application.keys["pipelines"].values()}
+
+            self.embeddings = {key: value for key, value in self.embeddings.items() if key in embeddings}
+            self.pipelines = {key: value for key, value in self.pipelines.items() if key in pipelines}
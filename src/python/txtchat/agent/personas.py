@@ -0,0 +1,216 @@
+"""
+Personas module
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import time
+
+import huggingface_hub
+import yaml
+
+# Logging configuration
+logger = logging.getLogger(__name__)
+
+
+class Personas:
+    """
+    Local persona cache. Resolved persona configurations are stored along with a manifest of the models and indexes they reference.
+    Personas are read from the cache when available, which avoids a Hugging Face Hub round trip on each restart. With offline mode,
+    the network is never used and all models must already be in the local Hugging Face cache.
+    """
+
+    # Hugging Face Hub persona repository
+    REPOSITORY = "neuml/txtchat-personas"
+
+    # Configuration keys that can reference models and indexes
+    KEYS = ["path", "model", "container"]
+
+    # Hugging Face Hub repository id with an optional file path, for example neuml/model or neuml/model-GGUF/model.gguf
+    PATTERN = re.compile(r"^[\w\-.]+/[\w\-.]+(/[\w\-./]+)?$")
+
+    def __init__(self, path=None, offline=None):
+        """
+        Creates a new persona cache.
+
+        Args:
+            path: cache directory, defaults to the TXTCHAT_CACHE environment variable or ~/.cache/txtchat
+            offline: never use the network if True, defaults to the TXTCHAT_OFFLINE environment variable
+        """
+
+        self.path = path if path else os.environ.get("TXTCHAT_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "txtchat"))
+        self.offline = offline if offline is not None else os.environ.get("TXTCHAT_OFFLINE", "").lower() in ["1", "true", "yes"]
+
+        # Disable Hugging Face Hub network access
+        if self.offline:
+            self.disconnect()
+
+    def resolve(self, name):
+        """
+        Resolves a persona name to a local configuration file. The local cache is checked first. Personas not in the cache are
+        downloaded from the Hugging Face Hub unless offline mode is enabled.
+
+        Args:
+            name: persona name
+
+        Returns:
+            path to local configuration file
+        """
+
+        path = self.persona(name)
+        if os.path.exists(path):
+            return path
+
+        if self.offline:
+            raise FileNotFoundError(f"Persona {name} not found in cache {self.path}. Run with --prefetch to cache it first.")
+
+        return self.download(name)
+
+    def prefetch(self, name):
+        """
+        Caches a persona configuration and downloads all the models and indexes it references. A manifest with the local paths of the
+        downloaded models is stored next to the cached configuration.
+
+        Args:
+            name: path to a local configuration file or persona name on the Hugging Face Hub
+
+        Returns:
+            manifest
+        """
+
+        # Refresh persona configuration
+        if os.path.exists(name):
+            path = self.persona(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.copyfile(name, path)
+        else:
+            path = self.download(name)
+
+        with open(path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f)
+
+        # Download referenced models and indexes
+        models = []
+        for key, reference in self.references(config):
+            # pylint: disable=W0703
+            try:
+                local = self.fetch(reference)
+                models.append({"key": key, "reference": reference, "path": local})
+                logger.info("Cached %s (%s)", reference, key)
+
+            except Exception as e:
+                logger.warning("Skipping %s (%s): %s", reference, key, e)
+
+        manifest = {
+            "persona": os.path.basename(name),
+            "config": path,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "models": models,
+        }
+
+        # Write manifest
+        with open(self.manifest(name), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        return manifest
+
+    def download(self, name):
+        """
+        Downloads a persona configuration from the Hugging Face Hub into the local cache.
+
+        Args:
+            name: persona name
+
+        Returns:
+            path to local configuration file
+        """
+
+        source = huggingface_hub.hf_hub_download(repo_id=Personas.REPOSITORY, filename=os.path.basename(name))
+
+        path = self.persona(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(source, path)
+
+        return path
+
+    def references(self, config, prefix=None):
+        """
+        Finds Hugging Face Hub model and index references in a persona configuration.
+
+        Args:
+            config: configuration
+            prefix: parent configuration key
+
+        Returns:
+            list of (configuration key, reference)
+        """
+
+        references = []
+        if isinstance(config, dict):
+            for key, value in config.items():
+                name = f"{prefix}.{key}" if prefix else str(key)
+                if key in Personas.KEYS and isinstance(value, str) and not os.path.exists(value) and Personas.PATTERN.match(value):
+                    references.append((name, value))
+                else:
+                    references.extend(self.references(value, name))
+
+        elif isinstance(config, list):
+            for x, value in enumerate(config):
+                references.extend(self.references(value, f"{prefix}[{x}]"))
+
+        return references
+
+    def fetch(self, reference):
+        """
+        Downloads a model or index reference into the local Hugging Face cache.
+
+        Args:
+            reference: repository id with an optional file path
+
+        Returns:
+            local path
+        """
+
+        parts = reference.split("/")
+        repo, filename = "/".join(parts[:2]), "/".join(parts[2:])
+
+        # Single file reference, otherwise full repository
+        return huggingface_hub.hf_hub_download(repo_id=repo, filename=filename) if filename else huggingface_hub.snapshot_download(repo_id=repo)
+
+    def persona(self, name):
+        """
+        Gets the cached configuration path for a persona.
+
+        Args:
+            name: persona name or path
+
+        Returns:
+            cached configuration path
+        """
+
+        return os.path.join(self.path, "personas", os.path.basename(name))
+
+    def manifest(self, name):
+        """
+        Gets the manifest path for a persona.
+
+        Args:
+            name: persona name or path
+
+        Returns:
+            manifest path
+        """
+
+        return f"{os.path.splitext(self.persona(name))[0]}.manifest.json"
+
+    def disconnect(self):
+        """
+        Disables network access for the Hugging Face Hub. The environment is also updated so that worker processes inherit this setting.
+        """
+
+        os.environ["TXTCHAT_OFFLINE"] = "1"
+        os.environ["HF_HUB_OFFLINE"] = "1"
+        huggingface_hub.constants.HF_HUB_OFFLINE = True
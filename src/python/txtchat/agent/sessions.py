@@ -0,0 +1,219 @@
+"""
+Sessions module
+"""
+
+import threading
+import time
+
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping
+
+from ..cache import SQLiteCache
+from ..metrics import registry
+
+
+class History(deque):
+    """
+    Conversation history for a single session. History is trimmed to an estimated token budget, oldest turns are removed first.
+    """
+
+    # Estimated number of characters per token
+    CHARACTERS = 4
+
+    def __init__(self, turns=(), maxlen=None, budget=None, save=None):
+        """
+        Creates a new History.
+
+        Args:
+            turns: initial list of (request, response) turns
+            maxlen: maximum number of turns
+            budget: maximum number of tokens, None for no limit
+            save: function called with this history after each change
+        """
+
+        super().__init__(turns, maxlen)
+
+        self.budget = budget
+        self.save = save
+
+        self.trim()
+
+    def __setitem__(self, index, turn):
+        super().__setitem__(index, turn)
+        self.update()
+
+    def append(self, x):
+        super().append(x)
+        self.update()
+
+    def update(self):
+        """
+        Trims history to the token budget and saves changes.
+        """
+
+        self.trim()
+        if self.save:
+            self.save(self)
+
+    def trim(self):
+        """
+        Removes the oldest turns until history fits the token budget.
+        """
+
+        while self and self.budget is not None and self.tokens() > self.budget:
+            self.popleft()
+
+    def tokens(self):
+        """
+        Estimates the number of tokens in this history.
+
+        Returns:
+            estimated number of tokens
+        """
+
+        return sum(len(str(request)) + len(str(response)) for request, response in self) / History.CHARACTERS
+
+
+class Sessions(MutableMapping):
+    """
+    Bounded conversation session store, used as txtai agent memory. Live sessions are kept in memory up to a maximum count and
+    evicted least recently used first. Sessions expire after a period of inactivity. History is trimmed to a token budget relative
+    to the maximum sequence length, which keeps prompt sizes bounded.
+
+    Sessions can optionally be persisted to disk. Persisted sessions are loaded when a session sends its next message, which
+    allows evicted sessions and sessions from previous runs to continue.
+    """
+
+    def __init__(self, config, window, maxlength=8192, action=None):
+        """
+        Creates a new Sessions store.
+
+        Args:
+            config: sessions configuration
+            window: maximum number of turns per session
+            maxlength: maximum sequence length of the agent LLM
+            action: action name used as a metric label
+        """
+
+        self.window, self.action = window, action
+
+        # Maximum number of live sessions and session time-to-live in seconds
+        self.size, self.ttl = config.get("size", 10000), config.get("ttl")
+
+        # Token budget for history per session
+        self.budget = int(maxlength * config.get("history", 0.5))
+
+        # session -> (history, last access time) ordered by least recently used
+        self.data = OrderedDict()
+
+        # Persisted sessions, session id -> list of turns. Persisted sessions also expire after ttl seconds.
+        self.store = None
+        if config.get("path"):
+            self.store = SQLiteCache({"path": config["path"], "ttl": self.ttl, "size": config.get("storage", 64 * 1024 * 1024)})
+
+        # Sessions are shared by action worker threads
+        self.lock = threading.RLock()
+
+    def __getitem__(self, session):
+        with self.lock:
+            now = time.time()
+
+            if session in self.data:
+                history, accessed = self.data[session]
+
+                # Expire inactive sessions
+                if self.ttl and accessed + self.ttl < now:
+                    del self[session]
+                    raise KeyError(session)
+
+                # Mark as most recently used
+                self.data[session] = (history, now)
+                self.data.move_to_end(session)
+                return history
+
+            # Load persisted session
+            turns = self.store.get(str(session)) if self.store else None
+            if turns is None:
+                raise KeyError(session)
+
+            # pylint: disable=E1133
+            return self.insert(session, [tuple(turn) for turn in turns])
+
+    def __setitem__(self, session, turns):
+        with self.lock:
+            # Trim and persist new sessions, for example a session reset
+            self.insert(session, turns).update()
+
+    def __delitem__(self, session):
+        with self.lock:
+            self.data.pop(session, None)
+
+            if self.store:
+                with self.store.lock:
+                    self.store.remove(str(session))
+                    self.store.connection.commit()
+
+    def __iter__(self):
+        with self.lock:
+            self.expire(time.time())
+            return iter(list(self.data))
+
+    def __len__(self):
+        with self.lock:
+            self.expire(time.time())
+            return len(self.data)
+
+    def insert(self, session, turns):
+        """
+        Adds a live session, evicting inactive and least recently used sessions as necessary.
+
+        Args:
+            session: session id
+            turns: list of (request, response) turns
+
+        Returns:
+            session history
+        """
+
+        now = time.time()
+
+        # Persist each change, if enabled
+        save = (lambda history: self.save(session, history)) if self.store else None
+
+        history = History(turns, self.window, self.budget, save)
+        self.data[session] = (history, now)
+        self.data.move_to_end(session)
+
+        # Evict expired sessions
+        self.expire(now)
+
+        # Evict least recently used sessions
+        while self.size and len(self.data) > self.size:
+            self.data.popitem(last=False)
+
+        registry.gauge("txtchat_sessions", len(self.data), action=self.action)
+        return history
+
+    def expire(self, now):
+        """
+        Evicts live sessions that have been inactive longer than the session time-to-live.
+
+        Args:
+            now: current time
+        """
+
+        # Sessions are ordered by last access time
+        while self.ttl and self.data and next(iter(self.data.values()))[1] + self.ttl < now:
+            self.data.popitem(last=False)
+
+    def save(self, session, history):
+        """
+        Persists a session.
+
+        Args:
+            session: session id
+            history: session history
+        """
+
+        with self.lock:
+            self.store.put(str(session), [[str(request), str(response)] for request, response in history])
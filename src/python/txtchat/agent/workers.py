@@ -0,0 +1,294 @@
+"""
+Workers module
+"""
+
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+
+# Logging configuration
+logger = logging.getLogger(__name__)
+
+
+class Workers:
+    """
+    Runs agent actions in a pool of worker processes. Each worker process loads its own application and can be pinned to its own
+    set of CPU cores, which allows a single chat connection to use all cores of a machine.
+
+    Messages are routed to workers by session, so messages in the same session always run on the same worker. Workers are health
+    checked and restarted when they exit or stop making progress. Each worker sends results over its own pipe, so a worker that is
+    killed can't corrupt results for other workers.
+    """
+
+    def __init__(self, agent, config, count=2, affinity=True, interval=5.0, timeout=300.0):
+        """
+        Creates a new Workers pool.
+
+        Args:
+            agent: Agent class used to create the agent in each worker process
+            config: persona configuration loaded by each worker
+            count: number of worker processes
+            affinity: pin each worker to a separate set of CPU cores if True
+            interval: health check interval in seconds
+            timeout: maximum time in seconds a worker with pending requests can go without returning a result before it's
+                     restarted, None to disable
+        """
+
+        self.agent = agent
+        self.config = config
+        self.count = count
+        self.interval = interval
+        self.timeout = timeout
+
+        # Split available cores across workers
+        self.cores = self.partition(count) if affinity else [None] * count
+
+        # Spawn workers to avoid forking loaded models and threads
+        self.context = multiprocessing.get_context("spawn")
+
+        # Worker processes and inbound queues
+        self.processes, self.queues = [None] * count, [None] * count
+
+        # Worker loaded flags and last time each worker made progress
+        self.loaded, self.progress = [False] * count, [0.0] * count
+
+        # Result pipes, connection -> worker index. Pipes of exited workers are kept until they are drained.
+        self.results = {}
+
+        # Pending requests, uid -> (future, worker index)
+        self.pending, self.ids, self.lock = {}, itertools.count(), threading.Lock()
+
+        # Round robin counter for requests without a session
+        self.robin = itertools.count()
+
+        # Start workers
+        for index in range(count):
+            self.start(index)
+
+        # Start result reader and health check threads
+        self.running = True
+        threading.Thread(target=self.read, name="workers-results", daemon=True).start()
+        threading.Thread(target=self.monitor, name="workers-monitor", daemon=True).start()
+
+    def __call__(self, text, **kwargs):
+        """
+        Runs an action for text in a worker process and waits for the response.
+
+        Args:
+            text: input text
+            kwargs: additional keyword arguments
+
+        Returns:
+            response
+        """
+
+        # Route by session to keep per-session state on a single worker
+        session = kwargs.get("session")
+        index = hash(session) % self.count if session is not None else next(self.robin) % self.count
+
+        future = Future()
+        with self.lock:
+            # Progress deadline starts when an idle worker receives a request
+            if not any(worker == index for _, worker in self.pending.values()):
+                self.progress[index] = time.monotonic()
+
+            uid = next(self.ids)
+            self.pending[uid] = (future, index)
+            self.queues[index].put((uid, text, kwargs))
+
+        return future.result()
+
+    def close(self):
+        """
+        Stops all worker processes and the result reader and health check threads. Pending requests fail.
+        """
+
+        self.running = False
+
+        for index, process in enumerate(self.processes):
+            if process and process.is_alive():
+                self.queues[index].put(None)
+                process.join(timeout=5)
+
+                if process.is_alive():
+                    process.terminate()
+
+        # Fail requests that didn't finish
+        with self.lock:
+            for future, _ in self.pending.values():
+                future.set_exception(RuntimeError("Workers closed"))
+
+            self.pending.clear()
+
+    def start(self, index):
+        """
+        Starts a worker process with a new request queue and result pipe.
+
+        Args:
+            index: worker index
+        """
+
+        receiver, sender = self.context.Pipe(duplex=False)
+
+        self.queues[index], self.loaded[index] = self.context.Queue(), False
+        self.processes[index] = self.context.Process(
+            target=Workers.run,
+            args=(self.agent, self.config, index, self.cores[index], self.queues[index], sender),
+            name=f"worker-{index}",
+            daemon=True,
+        )
+        self.processes[index].start()
+
+        # Only the worker writes to the pipe, closing this end lets the reader detect when the worker exits
+        sender.close()
+        self.results[receiver] = index
+
+        logger.info("Started worker %d (pid %d, cores %s)", index, self.processes[index].pid, self.cores[index])
+
+    def read(self):
+        """
+        Reads results from workers and resolves pending requests.
+        """
+
+        while self.running:
+            with self.lock:
+                connections = list(self.results)
+
+            # Wait with a timeout to pick up pipes of restarted workers
+            for connection in wait(connections, timeout=1.0):
+                try:
+                    uid, response = connection.recv()
+                except (EOFError, OSError):
+                    # Worker exited, its pipe is replaced when the worker is restarted
+                    with self.lock:
+                        self.results.pop(connection, None)
+                        connection.close()
+
+                    continue
+
+                with self.lock:
+                    # Worker finished loading, the progress deadline doesn't include load time
+                    if uid is None:
+                        index = self.results.get(connection)
+                        if index is not None:
+                            self.loaded[index], self.progress[index] = True, time.monotonic()
+
+                        continue
+
+                    future, index = self.pending.pop(uid, (None, None))
+                    if future:
+                        self.progress[index] = time.monotonic()
+
+                if future:
+                    future.set_result(response)
+
+    def monitor(self):
+        """
+        Health checks worker processes. Workers that exit or stop making progress are restarted and their pending requests fail.
+        """
+
+        while self.running:
+            time.sleep(self.interval)
+
+            for index, process in enumerate(self.processes):
+                # Stop workers stuck on a request
+                if self.running and process.is_alive() and self.stuck(index):
+                    logger.warning("Worker %d returned no results in %.0f seconds, stopping", index, self.timeout)
+                    process.kill()
+                    process.join(timeout=5)
+
+                if self.running and not process.is_alive():
+                    logger.warning("Worker %d exited with code %s, restarting", index, process.exitcode)
+
+                    # Fail pending requests for this worker
+                    with self.lock:
+                        failed = [uid for uid, (_, worker) in self.pending.items() if worker == index]
+                        for uid in failed:
+                            self.pending.pop(uid)[0].set_exception(RuntimeError(f"Worker {index} exited"))
+
+                        self.start(index)
+
+    def stuck(self, index):
+        """
+        Checks if a loaded worker has pending requests and hasn't returned a result within the timeout.
+
+        Args:
+            index: worker index
+
+        Returns:
+            True if the worker is stuck
+        """
+
+        with self.lock:
+            pending = any(worker == index for _, worker in self.pending.values())
+            return bool(self.timeout) and self.loaded[index] and pending and time.monotonic() - self.progress[index] > self.timeout
+
+    def partition(self, count):
+        """
+        Splits the available CPU cores into count sets.
+
+        Args:
+            count: number of sets
+
+        Returns:
+            list of core sets, list of None if CPU affinity isn't supported
+        """
+
+        if not hasattr(os, "sched_getaffinity"):
+            return [None] * count
+
+        cores = sorted(os.sched_getaffinity(0))
+        size = max(len(cores) // count, 1)
+
+        return [set(cores[(x * size) % len(cores) : (x * size) % len(cores) + size]) for x in range(count)]
+
+    @staticmethod
+    def run(agent, config, index, cores, inbound, outbound):
+        """
+        Worker process main loop.
+
+        Args:
+            agent: Agent class
+            config: persona configuration
+            index: worker index
+            cores: set of CPU cores to pin this worker to, None to skip
+            inbound: request queue
+            outbound: result pipe
+        """
+
+        logging.basicConfig(format=f"%(asctime)s [%(levelname)s] worker-{index} %(funcName)s: %(message)s")
+        logging.getLogger().setLevel(logging.INFO)
+
+        # Pin worker to cores
+        if cores:
+            os.sched_setaffinity(0, cores)
+
+        # Load agent in this process without a chat connection
+        agent = agent(config, chat=False)
+        logger.info("Worker %d ready", index)
+
+        # Notify parent process that this worker is loaded
+        outbound.send((None, None))
+
+        while True:
+            request = inbound.get()
+            if request is None:
+                break
+
+            uid, text, kwargs = request
+
+            # pylint: disable=W0703
+            try:
+                response = agent.execute(text, **kwargs)
+            except Exception:
+                response = "I had an error processing this request"
+                logger.error(traceback.format_exc())
+
+            outbound.send((uid, response if isinstance(response, str) else str(response)))
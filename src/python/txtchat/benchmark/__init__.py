@@ -0,0 +1,12 @@
+"""
+Benchmark imports
+"""
+
+from .base import Benchmark
+from .direct import Direct
+from .load import Load
+from .mattermost import MockMattermost
+from .replay import Replay, Traffic
+from .rocketchat import MockRocketChat
+from .server import Server, Socket
+from .stub import Stub
@@ -0,0 +1,54 @@
+"""
+Main benchmark execution method
+"""
+
+import argparse
+import logging
+
+import yaml
+
+from ..agent import Agent
+
+from .base import Benchmark
+from .replay import Replay
+from .stub import Stub
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="benchmark", description="Load tests a chat provider against a mock chat server")
+    parser.add_argument("--provider", default="mattermost", choices=["mattermost", "rocketchat"], help="chat provider")
+    parser.add_argument("--users", type=int, default=10, help="number of simulated users")
+    parser.add_argument("--rate", type=float, default=10.0, help="messages per second across all users")
+    parser.add_argument("--messages", type=int, default=100, help="total number of messages")
+    parser.add_argument("--latency", type=float, default=0.1, help="stub action response time in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="stub action response time standard deviation in seconds")
+    parser.add_argument("--persona", help="run a persona instead of the stub action")
+    parser.add_argument("--config", help="YAML file with chat connection settings, such as scheduler settings")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for replies after all messages are sent")
+    parser.add_argument("--replay", help="replay a recorded traffic log instead of generating load")
+    parser.add_argument("--mode", default="chat", choices=["chat", "agent"], help="replay through a chat provider or directly through the action")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier, 0 replays as fast as possible")
+    parser.add_argument("--output", help="record replayed traffic to this path")
+    args = parser.parse_args()
+
+    # Configure logging
+    logging.basicConfig(format="%(asctime)s [%(levelname)s] %(funcName)s: %(message)s")
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # Chat connection settings
+    config = {}
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f)
+
+    # Action to run for each message
+    action = Agent(args.persona, chat=False).execute if args.persona else Stub(args.latency, args.jitter)
+
+    # Run benchmark
+    if args.replay:
+        report = Replay(args.replay, args.mode, args.provider, action, config, args.speed, args.timeout, args.output)()
+    else:
+        report = Benchmark(args.provider, action, config, args.users, args.rate, args.messages, args.timeout)()
+
+    for key, value in report.items():
+        print(f"{key:<24} {value}" if isinstance(value, int) else f"{key:<24} {value:.4f}")
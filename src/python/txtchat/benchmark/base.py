@@ -0,0 +1,102 @@
+"""
+Benchmark module
+"""
+
+import asyncio
+import contextlib
+
+from ..chat import ChatFactory
+
+from .load import Load
+from .mattermost import MockMattermost
+from .rocketchat import MockRocketChat
+from .stub import Stub
+
+
+class Benchmark:
+    """
+    Runs a chat provider end-to-end against an in-process mock chat server and reports throughput and latency. No network access
+    is required.
+    """
+
+    def __init__(self, provider="mattermost", action=None, config=None, users=10, rate=10.0, count=100, timeout=60.0):
+        """
+        Creates a new Benchmark.
+
+        Args:
+            provider: chat provider, mattermost or rocketchat
+            action: action to execute for each message, defaults to a Stub action
+            config: additional chat connection configuration
+            users: number of simulated users
+            rate: messages per second across all users
+            count: total number of messages
+            timeout: maximum time in seconds to wait for replies after all messages are sent
+        """
+
+        self.provider = provider
+        self.action = action if action else Stub()
+        self.config = config if config else {}
+
+        self.users, self.rate, self.count, self.timeout = users, rate, count, timeout
+
+    def __call__(self):
+        """
+        Runs this benchmark.
+
+        Returns:
+            report
+        """
+
+        return asyncio.run(self.run())
+
+    async def run(self):
+        """
+        Starts a mock chat server and a chat provider connected to it, then runs the load test.
+
+        Returns:
+            report
+        """
+
+        server = MockMattermost() if self.provider == "mattermost" else MockRocketChat()
+        await server.start()
+
+        # Create simulated users before the bot connects
+        load = self.load(server)
+        load.setup()
+
+        # Connect chat provider to the mock server
+        config = {
+            "name": "benchmark",
+            **self.config,
+            "provider": self.provider,
+            "url": server.url,
+            "token": "token",
+            "username": "bot",
+            "password": "bot",
+        }
+        chat = ChatFactory.create(config, self.action)
+        task = asyncio.create_task(chat.loop())
+
+        try:
+            await asyncio.wait_for(server.ready.wait(), 30)
+            return await load(self.timeout)
+
+        finally:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+            await server.stop()
+
+    def load(self, server):
+        """
+        Creates the load generator for this benchmark.
+
+        Args:
+            server: mock chat server
+
+        Returns:
+            load generator
+        """
+
+        return Load(server, self.users, self.rate, self.count)
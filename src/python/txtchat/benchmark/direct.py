@@ -0,0 +1,62 @@
+"""
+Direct module
+"""
+
+import asyncio
+import itertools
+import time
+
+from ..chat import Chat
+from ..tracing import tracer
+
+
+class Direct(Chat):
+    """
+    Offline chat provider that sends a message schedule straight to the action without a chat server. Messages still go through
+    the same scheduler, action executor and recorder as a connected chat provider.
+    """
+
+    def __init__(self, config, action, schedule):
+        """
+        Creates a new Direct chat provider.
+
+        Args:
+            config: chat configuration
+            action: chat action to execute for each message
+            schedule: list of (offset in seconds from start, channel, text)
+        """
+
+        super().__init__(config, action)
+
+        self.schedule = schedule
+
+        # Message id generator
+        self.ids = itertools.count(1)
+
+    async def start(self):
+        start = time.monotonic()
+        for offset, channel, text in self.schedule:
+            delay = start + offset - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            # Messages are sampled for tracing when received, same as chat providers
+            with tracer.activate(tracer.start()):
+                self.submit(channel, text)
+
+        # Wait for all sessions to finish processing
+        while self.scheduler.workers:
+            await asyncio.sleep(0.01)
+
+    # pylint: disable=W0613
+    async def finish(self):
+        pass
+
+    async def typing(self, channel):
+        pass
+
+    async def sendmessage(self, channel, message):
+        return next(self.ids)
+
+    async def updatemessage(self, channel, uid, message):
+        pass
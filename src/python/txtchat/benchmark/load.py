@@ -0,0 +1,158 @@
+"""
+Load module
+"""
+
+import asyncio
+import math
+import time
+
+
+class Load:
+    """
+    Load generator. Simulated users send direct messages to the bot at a fixed overall rate. Reports throughput, end-to-end latency
+    percentiles and event loop lag, which shows when the event loop is blocked.
+    """
+
+    def __init__(self, server, users=10, rate=10.0, count=100):
+        """
+        Creates a new Load generator.
+
+        Args:
+            server: mock chat server
+            users: number of simulated users
+            rate: messages per second across all users
+            count: total number of messages
+        """
+
+        self.server = server
+        self.users = users
+        self.rate = rate
+        self.count = count
+
+        # Direct message channel per user
+        self.channels = []
+
+    def setup(self):
+        """
+        Creates simulated users on the mock chat server.
+        """
+
+        self.channels = [self.server.adduser(f"user{x}") for x in range(self.users)]
+
+    async def __call__(self, timeout=60.0):
+        """
+        Sends messages and waits for replies.
+
+        Args:
+            timeout: maximum time in seconds to wait for replies after all messages are sent
+
+        Returns:
+            report
+        """
+
+        # Measure event loop lag while the load runs
+        lags = []
+        monitor = asyncio.create_task(self.monitor(lags))
+
+        start = time.monotonic()
+        for offset, channel, text in self.schedule():
+            delay = start + offset - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            await self.server.send(channel, text)
+
+        await self.server.wait(self.count, timeout)
+
+        elapsed = time.monotonic() - start
+        monitor.cancel()
+
+        return self.report(self.server.latencies, elapsed, lags)
+
+    def schedule(self):
+        """
+        Builds the list of messages to send. Messages are sent round robin across users at a fixed rate.
+
+        Returns:
+            list of (offset in seconds from start, channel, text)
+        """
+
+        return [(x / self.rate, self.channels[x % len(self.channels)], f"Message {x}") for x in range(self.count)]
+
+    async def monitor(self, lags, interval=0.01):
+        """
+        Measures how late the event loop wakes up from a fixed sleep.
+
+        Args:
+            lags: list to store lag measurements
+            interval: sleep interval in seconds
+        """
+
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(interval)
+            lags.append(time.monotonic() - start - interval)
+
+    def report(self, latencies, elapsed, lags):
+        """
+        Builds a load test report.
+
+        Args:
+            latencies: end-to-end latencies in seconds
+            elapsed: total run time in seconds
+            lags: event loop lag measurements in seconds
+
+        Returns:
+            report
+        """
+
+        return {
+            "messages": self.count,
+            "replies": len(latencies),
+            "elapsed": elapsed,
+            "throughput": len(latencies) / elapsed if elapsed else 0.0,
+            "p50": self.percentile(latencies, 50),
+            "p95": self.percentile(latencies, 95),
+            "p99": self.percentile(latencies, 99),
+            "max": max(latencies, default=0.0),
+            "lag": max(lags, default=0.0),
+        }
+
+    def stages(self, entries):
+        """
+        Builds per-stage latency percentiles from recorded responses.
+
+        Args:
+            entries: recorded log entries
+
+        Returns:
+            {"stage percentile": seconds}
+        """
+
+        responses = [entry for entry in entries if entry["event"] == "response"]
+
+        report = {}
+        for stage in ("queue", "execute", "send", "latency"):
+            values = [entry[stage] for entry in responses if stage in entry]
+            for p in (50, 95, 99):
+                report[f"{stage} p{p}"] = self.percentile(values, p)
+
+        return report
+
+    def percentile(self, values, p):
+        """
+        Calculates a percentile using the nearest-rank method.
+
+        Args:
+            values: list of values
+            p: percentile (0 - 100)
+
+        Returns:
+            percentile value
+        """
+
+        if not values:
+            return 0.0
+
+        values = sorted(values)
+        return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
@@ -0,0 +1,155 @@
+"""
+Mattermost module
+"""
+
+import json
+import time
+
+from .server import Server
+
+
+class MockMattermost(Server):
+    """
+    Mock Mattermost server. Implements the subset of the Mattermost v4 REST and websocket API used by the Mattermost chat provider.
+    """
+
+    # Route handlers share a common signature
+    # pylint: disable=W0613
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__(host, port)
+
+        # Bot user
+        self.user = {"id": self.uid(), "username": "bot"}
+
+        # Channels, users and posts
+        self.channels, self.users, self.posts = {}, {}, {}
+
+        # Websocket event sequence
+        self.seq = 0
+
+        self.route("GET", "/api/v4/users/me", lambda params, body: (200, self.user))
+        self.route("GET", "/api/v4/users/me/channels", lambda params, body: (200, list(self.channels.values())))
+        self.route("POST", "/api/v4/users/me/typing", lambda params, body: (200, {"status": "OK"}))
+        self.route("GET", "/api/v4/channels/([^/]+)", self.channel)
+        self.route("GET", "/api/v4/channels/([^/]+)/posts", self.history)
+        self.route("POST", "/api/v4/posts", self.create)
+        self.route("PUT", "/api/v4/posts/([^/]+)/patch", self.patch)
+
+    def adduser(self, name):
+        user, channel = self.uid(), self.uid()
+
+        self.users[channel] = {"id": user, "username": name}
+        self.channels[channel] = {"id": channel, "type": "D", "name": f"{self.user['id']}__{user}", "last_post_at": 0}
+
+        return channel
+
+    async def message(self, channel, text):
+        post = self.post(channel, self.users[channel]["id"], text)
+        await self.broadcast(post)
+
+    async def onmessage(self, socket, message):
+        if message.get("action") == "authentication_challenge":
+            await socket.send({"status": "OK", "seq_reply": message.get("seq")})
+            self.ready.set()
+
+    def channel(self, params, body, channel):
+        """
+        Gets a channel.
+
+        Args:
+            params: query parameters
+            body: request body
+            channel: channel id
+
+        Returns:
+            (status, channel)
+        """
+
+        return (200, self.channels[channel]) if channel in self.channels else (404, {"message": "channel not found"})
+
+    def history(self, params, body, channel):
+        """
+        Gets posts in a channel created after the since parameter.
+
+        Args:
+            params: query parameters
+            body: request body
+            channel: channel id
+
+        Returns:
+            (status, posts)
+        """
+
+        since = int(params.get("since", 0))
+        posts = {uid: post for uid, post in self.posts.items() if post["channel_id"] == channel and post["create_at"] > since}
+
+        return 200, {"order": sorted(posts, key=lambda x: posts[x]["create_at"], reverse=True), "posts": posts}
+
+    def create(self, params, body):
+        """
+        Creates a bot post.
+
+        Args:
+            params: query parameters
+            body: request body
+
+        Returns:
+            (status, post)
+        """
+
+        self.reply(body["channel_id"])
+        return 201, self.post(body["channel_id"], self.user["id"], body["message"])
+
+    def patch(self, params, body, uid):
+        """
+        Updates a bot post.
+
+        Args:
+            params: query parameters
+            body: request body
+            uid: post id
+
+        Returns:
+            (status, post)
+        """
+
+        if uid not in self.posts:
+            return 404, {"message": "post not found"}
+
+        self.posts[uid]["message"] = body.get("message", self.posts[uid]["message"])
+        return 200, self.posts[uid]
+
+    def post(self, channel, user, text):
+        """
+        Stores a post.
+
+        Args:
+            channel: channel id
+            user: user id
+            text: message text
+
+        Returns:
+            post
+        """
+
+        post = {"id": self.uid(), "channel_id": channel, "user_id": user, "message": text, "create_at": int(time.time() * 1000)}
+        self.posts[post["id"]] = post
+
+        self.channels[channel]["last_post_at"] = post["create_at"]
+
+        return post
+
+    async def broadcast(self, post):
+        """
+        Sends a posted event to all websocket connections.
+
+        Args:
+            post: post
+        """
+
+        self.seq += 1
+        event = {"event": "posted", "data": {"channel_type": self.channels[post["channel_id"]]["type"], "post": json.dumps(post)}, "seq": self.seq}
+
+        for socket in list(self.sockets):
+            await socket.send(event)
@@ -0,0 +1,144 @@
+"""
+Replay module
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+from ..chat import Recorder
+
+from .base import Benchmark
+from .direct import Direct
+from .load import Load
+
+
+class Traffic(Load):
+    """
+    Load generator that replays recorded traffic. Each recorded channel is mapped to a simulated user and messages are sent with
+    their recorded timing.
+    """
+
+    def __init__(self, server, entries, speed=1.0):
+        """
+        Creates a new Traffic load generator.
+
+        Args:
+            server: mock chat server, None when messages are not sent through a chat server
+            entries: recorded log entries
+            speed: replay speed multiplier, 0 sends messages as fast as possible
+        """
+
+        # Recorded incoming messages
+        self.messages = [entry for entry in entries if entry["event"] == "message"]
+
+        super().__init__(server, len({message["channel"] for message in self.messages}), count=len(self.messages))
+
+        self.speed = speed
+
+        # Simulated user channel per recorded channel
+        self.channels = {}
+
+    def setup(self):
+        recorded = list(dict.fromkeys(message["channel"] for message in self.messages))
+        self.channels = {channel: self.server.adduser(f"user{x}") for x, channel in enumerate(recorded)}
+
+    def schedule(self):
+        start = self.messages[0]["time"] if self.messages else 0
+
+        return [
+            (
+                (message["time"] - start) / self.speed if self.speed else 0,
+                self.channels.get(message["channel"], message["channel"]),
+                message["text"],
+            )
+            for message in self.messages
+        ]
+
+
+class Replay(Benchmark):
+    """
+    Replays a recorded traffic log and reports throughput and per-stage latency. Messages run either through a full chat provider
+    connected to a mock chat server (chat mode) or straight through the action (agent mode).
+    """
+
+    def __init__(self, path, mode="chat", provider="mattermost", action=None, config=None, speed=1.0, timeout=60.0, output=None):
+        """
+        Creates a new Replay.
+
+        Args:
+            path: recorded traffic log
+            mode: chat to replay through a chat provider or agent to replay directly through the action
+            provider: chat provider used in chat mode, mattermost or rocketchat
+            action: action to execute for each message, defaults to a Stub action
+            config: additional chat connection configuration
+            speed: replay speed multiplier, 0 sends messages as fast as possible
+            timeout: maximum time in seconds to wait for replies after all messages are sent
+            output: optional path to record the replayed traffic, overwritten if it exists
+        """
+
+        super().__init__(provider, action, config, timeout=timeout)
+
+        self.mode, self.speed, self.output = mode, speed, output
+
+        # Recorded traffic
+        self.entries = Recorder.load(path)
+
+    async def run(self):
+        # Record replayed traffic to collect per-stage timings
+        output = self.output
+        if output:
+            if os.path.exists(output):
+                os.remove(output)
+        else:
+            descriptor, output = tempfile.mkstemp(suffix=".jsonl")
+            os.close(descriptor)
+
+        self.config = {**self.config, "record": {"path": output, "responses": True}}
+
+        # Messages all arrive at once when replaying as fast as possible, keep them unless a queue depth is configured
+        if not self.speed:
+            self.config["scheduler"] = {"depth": len(self.entries), **self.config.get("scheduler", {})}
+
+        try:
+            report = await (super().run() if self.mode == "chat" else self.direct())
+            replayed = Recorder.load(output)
+        finally:
+            if not self.output:
+                os.remove(output)
+
+        # Compare replayed stage timings with recorded stage timings, if available
+        load = self.load(None)
+        report.update(load.stages(replayed))
+        if any(entry["event"] == "response" for entry in self.entries):
+            report.update({f"recorded {key}": value for key, value in load.stages(self.entries).items()})
+
+        return report
+
+    def load(self, server):
+        return Traffic(server, self.entries, self.speed)
+
+    async def direct(self):
+        """
+        Replays traffic straight through the action.
+
+        Returns:
+            report
+        """
+
+        load = self.load(None)
+
+        # Measure event loop lag while the replay runs
+        lags = []
+        monitor = asyncio.create_task(load.monitor(lags))
+
+        start = time.monotonic()
+        await Direct({"name": "replay", **self.config}, self.action, load.schedule()).loop()
+
+        elapsed = time.monotonic() - start
+        monitor.cancel()
+
+        # End-to-end latency comes from the replayed traffic recording
+        latencies = [entry["latency"] for entry in Recorder.load(self.config["record"]["path"]) if entry["event"] == "response"]
+        return load.report(latencies, elapsed, lags)
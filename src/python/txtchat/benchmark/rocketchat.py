@@ -0,0 +1,192 @@
+"""
+RocketChat module
+"""
+
+import time
+
+from datetime import datetime, timezone
+
+from .server import Server
+
+
+class MockRocketChat(Server):
+    """
+    Mock Rocket.Chat server. Implements the subset of the Rocket.Chat REST and DDP websocket API used by the RocketChat chat provider.
+    """
+
+    # Route handlers share a common signature
+    # pylint: disable=W0613
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__(host, port)
+
+        # Bot user and authentication token
+        self.user, self.token = {"_id": self.uid(), "username": "bot"}, self.uid()
+
+        # Rooms, users and messages
+        self.rooms, self.users, self.messages = {}, {}, {}
+
+        self.route("POST", "/api/v1/login", self.login)
+        self.route("GET", "/api/v1/rooms.get", self.roomlist)
+        self.route("GET", "/api/v1/im.history", self.history)
+        self.route("POST", "/api/v1/chat.sendMessage", self.create)
+        self.route("POST", "/api/v1/chat.update", self.update)
+
+    def adduser(self, name):
+        user, rid = self.uid(), self.uid()
+
+        self.users[rid] = {"_id": user, "username": name}
+        self.rooms[rid] = {"_id": rid, "t": "d", "usernames": ["bot", name], "_updatedAt": self.isoformat(time.time())}
+
+        return rid
+
+    async def message(self, channel, text):
+        message = self.store(channel, self.users[channel], text)
+
+        # Send to websocket connections subscribed to all messages of the bot user
+        room = {"roomParticipant": True, "roomType": self.rooms[channel]["t"]}
+        event = {"msg": "changed", "collection": "stream-room-messages", "id": "id", "fields": {"eventName": channel, "args": [message, room]}}
+        for socket in list(self.sockets):
+            if socket.state.get("all"):
+                await socket.send(event)
+
+    async def onmessage(self, socket, message):
+        mtype = message.get("msg")
+
+        if mtype == "connect":
+            await socket.send({"msg": "connected", "session": self.uid()})
+
+        elif mtype == "method":
+            result = {"id": self.user["_id"], "token": self.token} if message.get("method") == "login" else None
+            await socket.send({"msg": "result", "id": message.get("id"), "result": result})
+
+        elif mtype == "sub":
+            # Room message subscription, __my_messages__ subscribes to all rooms
+            if message.get("name") == "stream-room-messages" and message["params"][0] == "__my_messages__":
+                socket.state["all"] = True
+
+            await socket.send({"msg": "ready", "subs": [message.get("id")]})
+
+            # Channel changes are subscribed after room messages
+            if message.get("name") == "stream-notify-user":
+                self.ready.set()
+
+    def login(self, params, body):
+        """
+        Logs in the bot user.
+
+        Args:
+            params: query parameters
+            body: request body
+
+        Returns:
+            (status, result)
+        """
+
+        return 200, {"status": "success", "data": {"userId": self.user["_id"], "authToken": self.token}}
+
+    def roomlist(self, params, body):
+        """
+        Lists rooms, optionally only rooms updated since the updatedSince parameter.
+
+        Args:
+            params: query parameters
+            body: request body
+
+        Returns:
+            (status, rooms)
+        """
+
+        since = params.get("updatedSince")
+        rooms = [room for room in self.rooms.values() if not since or room["_updatedAt"] > since]
+
+        return 200, {"update": rooms, "remove": [], "success": True}
+
+    def history(self, params, body):
+        """
+        Gets messages in a room newer than the oldest parameter, newest first. Supports count and offset paging.
+
+        Args:
+            params: query parameters
+            body: request body
+
+        Returns:
+            (status, messages)
+        """
+
+        oldest, offset, count = params.get("oldest", ""), int(params.get("offset", 0)), int(params.get("count", 20))
+
+        messages = [x for x in self.messages.values() if x["rid"] == params.get("roomId") and self.isoformat(x["ts"]["$date"] / 1000) > oldest]
+        messages = sorted(messages, key=lambda x: x["ts"]["$date"], reverse=True)[offset : offset + count]
+
+        return 200, {"messages": [{**x, "ts": self.isoformat(x["ts"]["$date"] / 1000)} for x in messages], "success": True}
+
+    def create(self, params, body):
+        """
+        Creates a bot message.
+
+        Args:
+            params: query parameters
+            body: request body
+
+        Returns:
+            (status, message)
+        """
+
+        message = body["message"]
+
+        self.reply(message["rid"])
+        return 200, {"message": self.store(message["rid"], self.user, message["msg"], message.get("_id")), "success": True}
+
+    def update(self, params, body):
+        """
+        Updates a bot message.
+
+        Args:
+            params: query parameters
+            body: request body
+
+        Returns:
+            (status, message)
+        """
+
+        if body.get("msgId") not in self.messages:
+            return 400, {"success": False, "error": "message not found"}
+
+        self.messages[body["msgId"]]["msg"] = body.get("text", "")
+        return 200, {"message": self.messages[body["msgId"]], "success": True}
+
+    def store(self, rid, user, text, uid=None):
+        """
+        Stores a message.
+
+        Args:
+            rid: room id
+            user: user
+            text: message text
+            uid: message id, generated if not provided
+
+        Returns:
+            message
+        """
+
+        message = {"_id": uid if uid else self.uid(), "rid": rid, "msg": text, "ts": {"$date": int(time.time() * 1000)}, "u": user}
+        self.messages[message["_id"]] = message
+
+        # New messages update the room
+        self.rooms[rid]["_updatedAt"] = self.rooms[rid]["lm"] = self.isoformat(message["ts"]["$date"] / 1000)
+
+        return message
+
+    def isoformat(self, timestamp):
+        """
+        Formats a timestamp as an ISO 8601 string.
+
+        Args:
+            timestamp: seconds since the epoch
+
+        Returns:
+            ISO 8601 string
+        """
+
+        return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
@@ -0,0 +1,331 @@
+"""
+Server module
+"""
+
+import asyncio
+import http
+import itertools
+import json
+import logging
+import re
+import time
+import urllib.parse
+
+from collections import deque
+
+from websockets.frames import Opcode
+from websockets.protocol import State
+from websockets.server import ServerProtocol
+
+# Logging configuration
+logger = logging.getLogger(__name__)
+
+
+class Socket:
+    """
+    Server side websocket connection.
+    """
+
+    def __init__(self, protocol, writer):
+        """
+        Creates a new Socket.
+
+        Args:
+            protocol: websockets server protocol
+            writer: stream writer
+        """
+
+        self.protocol = protocol
+        self.writer = writer
+
+        # Connection state, such as subscriptions
+        self.state = {}
+
+    async def send(self, message):
+        """
+        Sends a JSON message.
+
+        Args:
+            message: message
+        """
+
+        self.protocol.send_text(json.dumps(message).encode("utf-8"))
+        await self.flush()
+
+    async def flush(self):
+        """
+        Writes pending protocol data to the connection.
+        """
+
+        for data in self.protocol.data_to_send():
+            if data:
+                self.writer.write(data)
+            elif self.writer.can_write_eof():
+                # Empty data signals the end of the connection
+                self.writer.write_eof()
+
+        await self.writer.drain()
+
+
+class Server:
+    """
+    Minimal in-process chat server. Serves a JSON REST API and websocket connections on a single port. End-to-end latency is
+    tracked from each simulated user message to the first bot reply in the same channel.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        """
+        Creates a new Server.
+
+        Args:
+            host: host to listen on
+            port: port to listen on, 0 selects a free port
+        """
+
+        self.host, self.port = host, port
+        self.server = None
+
+        # Open websocket connections
+        self.sockets = set()
+
+        # Set when the bot is connected and listening for messages
+        self.ready = asyncio.Event()
+
+        # REST API routes, list of (method, path pattern, handler)
+        self.routes = []
+
+        # Pending message send times per channel and end-to-end latencies
+        self.pending, self.latencies = {}, []
+
+        # Id generator
+        self.ids = itertools.count(1)
+
+    @property
+    def url(self):
+        """
+        Base url for this server.
+
+        Returns:
+            url
+        """
+
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        """
+        Starts this server.
+        """
+
+        self.server = await asyncio.start_server(self.connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+        logger.info("Mock server listening on %s", self.url)
+
+    async def stop(self):
+        """
+        Stops this server.
+        """
+
+        self.server.close()
+        for socket in list(self.sockets):
+            socket.writer.close()
+
+    def route(self, method, pattern, handler):
+        """
+        Adds a REST API route.
+
+        Args:
+            method: HTTP method
+            pattern: path regular expression, groups are passed to the handler
+            handler: function(params, body, *groups) returning (status, result)
+        """
+
+        self.routes.append((method, re.compile(f"^{pattern}$"), handler))
+
+    def uid(self):
+        """
+        Generates a unique id.
+
+        Returns:
+            id
+        """
+
+        return f"{next(self.ids):024x}"
+
+    async def send(self, channel, text):
+        """
+        Sends a message from the simulated user in channel to the bot.
+
+        Args:
+            channel: channel id
+            text: message text
+        """
+
+        self.pending.setdefault(channel, deque()).append(time.monotonic())
+        await self.message(channel, text)
+
+    def reply(self, channel):
+        """
+        Records a bot reply in channel.
+
+        Args:
+            channel: channel id
+        """
+
+        pending = self.pending.get(channel)
+        if pending:
+            self.latencies.append(time.monotonic() - pending.popleft())
+
+    async def wait(self, count, timeout):
+        """
+        Waits for count replies.
+
+        Args:
+            count: number of replies
+            timeout: maximum time to wait in seconds
+        """
+
+        end = time.monotonic() + timeout
+        while len(self.latencies) < count and time.monotonic() < end:
+            await asyncio.sleep(0.01)
+
+    async def connection(self, reader, writer):
+        """
+        Handles a client connection. Connections are kept alive for multiple requests and can be upgraded to websockets.
+
+        Args:
+            reader: stream reader
+            writer: stream writer
+        """
+
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+
+                lines = head.decode("latin-1").split("\r\n")
+                method, target, _ = lines[0].split(" ", 2)
+                headers = {key.strip().lower(): value.strip() for key, value in (line.split(":", 1) for line in lines[1:] if ":" in line)}
+
+                # Websocket connection
+                if headers.get("upgrade", "").lower() == "websocket":
+                    await self.upgrade(head, reader, writer)
+                    return
+
+                # REST API request
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                url = urllib.parse.urlsplit(target)
+
+                status, result = await self.dispatch(method, url.path, dict(urllib.parse.parse_qsl(url.query)), json.loads(body) if body else {})
+
+                data = json.dumps(result).encode("utf-8")
+                head = f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n"
+
+                writer.write(head.encode("latin-1") + data)
+                await writer.drain()
+
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, params, body):
+        """
+        Runs the handler for a REST API request.
+
+        Args:
+            method: HTTP method
+            path: request path
+            params: query parameters
+            body: JSON request body
+
+        Returns:
+            (status, result)
+        """
+
+        for rmethod, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if rmethod == method and match:
+                return handler(params, body, *match.groups())
+
+        return 404, {"message": f"{method} {path} not found"}
+
+    async def upgrade(self, head, reader, writer):
+        """
+        Upgrades a connection to a websocket and processes incoming messages.
+
+        Args:
+            head: raw HTTP request head
+            reader: stream reader
+            writer: stream writer
+        """
+
+        protocol = ServerProtocol()
+        protocol.receive_data(head)
+        protocol.send_response(protocol.accept(protocol.events_received()[0]))
+
+        socket = Socket(protocol, writer)
+        await socket.flush()
+
+        self.sockets.add(socket)
+        try:
+            await self.onconnect(socket)
+
+            while protocol.state is not State.CLOSED:
+                data = await reader.read(65536)
+                if not data:
+                    break
+
+                protocol.receive_data(data)
+                for frame in protocol.events_received():
+                    if frame.opcode == Opcode.TEXT:
+                        await self.onmessage(socket, json.loads(frame.data))
+
+                # Send ping and close responses
+                await socket.flush()
+
+        finally:
+            self.sockets.discard(socket)
+
+    def adduser(self, name):
+        """
+        Adds a simulated user with a direct message channel to the bot.
+
+        Args:
+            name: user name
+
+        Returns:
+            channel id
+        """
+
+        raise NotImplementedError
+
+    async def message(self, channel, text):
+        """
+        Posts a message from the simulated user in channel.
+
+        Args:
+            channel: channel id
+            text: message text
+        """
+
+        raise NotImplementedError
+
+    async def onconnect(self, socket):
+        """
+        Called when a websocket connects.
+
+        Args:
+            socket: websocket connection
+        """
+
+    async def onmessage(self, socket, message):
+        """
+        Processes an incoming websocket message.
+
+        Args:
+            socket: websocket connection
+            message: JSON message
+        """
+
+        raise NotImplementedError
@@ -0,0 +1,42 @@
+"""
+Stub module
+"""
+
+import random
+import time
+
+
+class Stub:
+    """
+    Stand-in for a persona action with configurable latency. Replies echo the input message. Used to benchmark the chat stack
+    without loading models.
+    """
+
+    def __init__(self, latency=0.1, jitter=0.0):
+        """
+        Creates a new Stub.
+
+        Args:
+            latency: mean response time in seconds
+            jitter: standard deviation of the response time in seconds
+        """
+
+        self.latency = latency
+        self.jitter = jitter
+
+    def __call__(self, text, **kwargs):
+        """
+        Generates a response for text.
+
+        Args:
+            text: input text
+            kwargs: additional keyword arguments
+
+        Returns:
+            response
+        """
+
+        # Simulate model inference, which blocks the calling thread
+        time.sleep(max(random.gauss(self.latency, self.jitter) if self.jitter else self.latency, 0.0))
+
+        return f"Echo: {text}"
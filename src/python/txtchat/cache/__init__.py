@@ -0,0 +1,9 @@
+"""
+Cache imports
+"""
+
+from .base import Cache
+from .factory import CacheFactory
+from .memory import MemoryCache
+from .semantic import SemanticCache
+from .sqlite import SQLiteCache
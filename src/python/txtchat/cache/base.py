@@ -0,0 +1,145 @@
+"""
+Cache module
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+
+class Cache:
+    """
+    Base response cache class. Responses are stored by key and expire after an optional time-to-live.
+    """
+
+    @staticmethod
+    def key(action, text, namespace=None):
+        """
+        Builds a cache key for an action and input text. Text is normalized so that differences in case and whitespace
+        map to the same key.
+
+        Args:
+            action: action name
+            text: input text
+            namespace: optional namespace, such as a configuration hash
+
+        Returns:
+            cache key
+        """
+
+        # Normalize text
+        text = " ".join(text.casefold().split())
+
+        return hashlib.sha256(f"{namespace}\0{action}\0{text}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def namespace(config):
+        """
+        Builds a hash of a configuration. Used to separate cached responses between configurations.
+
+        Args:
+            config: configuration dictionary
+
+        Returns:
+            configuration hash
+        """
+
+        return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+    def __init__(self, config):
+        """
+        Creates a new cache.
+
+        Args:
+            config: cache configuration
+        """
+
+        self.config = config
+
+        # Time-to-live in seconds, None to disable
+        self.ttl = config.get("ttl")
+
+        # Maximum size in bytes, defaults to 64 MB. None for no limit.
+        self.size = config.get("size", 64 * 1024 * 1024)
+
+        # Hit and miss counters
+        self.hits, self.misses = 0, 0
+
+        # Caches are shared by action worker threads
+        self.lock = threading.RLock()
+
+    def get(self, key):
+        """
+        Gets a value from the cache.
+
+        Args:
+            key: cache key
+
+        Returns:
+            cached value or None if not found
+        """
+
+        with self.lock:
+            value = self.load(key, time.time())
+
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+            return value
+
+    def put(self, key, value):
+        """
+        Stores a value in the cache.
+
+        Args:
+            key: cache key
+            value: value to store
+        """
+
+        with self.lock:
+            self.save(key, value, time.time() + self.ttl if self.ttl else None)
+
+    def stats(self):
+        """
+        Gets cache statistics.
+
+        Returns:
+            dict with hits, misses and hit rate
+        """
+
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "rate": self.hits / total if total else 0.0}
+
+    def close(self):
+        """
+        Closes this cache.
+        """
+
+    def load(self, key, now):
+        """
+        Loads a value from the cache. Expired values are treated as missing.
+
+        Args:
+            key: cache key
+            now: current time
+
+        Returns:
+            cached value or None if not found
+        """
+
+        raise NotImplementedError
+
+    def save(self, key, value, expires):
+        """
+        Saves a value to the cache, evicting least recently used values as necessary.
+
+        Args:
+            key: cache key
+            value: value to store
+            expires: expiration time or None if value doesn't expire
+        """
+
+        raise NotImplementedError
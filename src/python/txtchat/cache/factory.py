@@ -0,0 +1,36 @@
+"""
+Factory module
+"""
+
+from .memory import MemoryCache
+from .sqlite import SQLiteCache
+
+
+class CacheFactory:
+    """
+    Methods to create response caches.
+    """
+
+    @staticmethod
+    def create(config):
+        """
+        Create a Cache.
+
+        Args:
+            config: cache configuration
+
+        Returns:
+            Cache
+        """
+
+        # Cache instance
+        cache = None
+        backend = config.get("backend")
+
+        # Create cache instance
+        if backend == "sqlite":
+            cache = SQLiteCache(config)
+        else:
+            cache = MemoryCache(config)
+
+        return cache
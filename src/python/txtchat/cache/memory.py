@@ -0,0 +1,75 @@
+"""
+Memory module
+"""
+
+import json
+
+from collections import OrderedDict
+
+from .base import Cache
+
+
+class MemoryCache(Cache):
+    """
+    In-memory LRU cache bounded by total size in bytes.
+    """
+
+    def __init__(self, config):
+        super().__init__(config)
+
+        # key -> (value, size, expires) ordered by least recently used
+        self.data = OrderedDict()
+        self.bytes = 0
+
+    def load(self, key, now):
+        if key not in self.data:
+            return None
+
+        value, _, expires = self.data[key]
+
+        # Remove expired values
+        if expires and expires < now:
+            self.remove(key)
+            return None
+
+        # Mark as most recently used
+        self.data.move_to_end(key)
+        return value
+
+    def save(self, key, value, expires):
+        # Replace existing value
+        if key in self.data:
+            self.remove(key)
+
+        size = self.sizeof(value)
+        self.data[key] = (value, size, expires)
+        self.bytes += size
+
+        # Evict least recently used values
+        while self.size and self.bytes > self.size and self.data:
+            self.remove(next(iter(self.data)))
+
+    def remove(self, key):
+        """
+        Removes a key from the cache.
+
+        Args:
+            key: cache key
+        """
+
+        _, size, _ = self.data.pop(key)
+        self.bytes -= size
+
+    def sizeof(self, value):
+        """
+        Estimates the size of a value in bytes.
+
+        Args:
+            value: value
+
+        Returns:
+            size in bytes
+        """
+
+        value = value if isinstance(value, str) else json.dumps(value, default=str)
+        return len(value.encode("utf-8"))
@@ -0,0 +1,108 @@
+"""
+Semantic module
+"""
+
+import numpy as np
+
+from .base import Cache
+
+
+class SemanticCache(Cache):
+    """
+    Semantic response cache. Questions are embedded into vectors and compared with previously answered questions. A cached response is
+    returned when the similarity is above a threshold, which also matches paraphrased questions.
+
+    Cache keys are question vectors built with vector(). Vectors are computed by the caller outside of the cache lock, so lookups
+    don't wait on the embeddings model. A cache miss reuses the same vector to store the response.
+
+    Each instance holds its own vector index, so responses are isolated per persona.
+    """
+
+    def __init__(self, config, transform):
+        """
+        Creates a new semantic cache.
+
+        Args:
+            config: cache configuration
+            transform: function that transforms text into a vector
+        """
+
+        super().__init__(config)
+
+        # Text vector function
+        self.transform = transform
+
+        # Minimum similarity score for a cache hit
+        self.threshold = config.get("threshold", 0.95)
+
+        # Maximum number of cached questions
+        self.count = config.get("count", 1000)
+
+        # Question vectors and (value, expires) entries ordered oldest first
+        self.vectors, self.entries = None, []
+
+    def load(self, key, now):
+        # Remove expired entries
+        self.expire(now)
+
+        if not self.entries:
+            return None
+
+        # Find the most similar question
+        scores = self.vectors @ key
+        index = int(np.argmax(scores))
+
+        return self.entries[index][0] if scores[index] >= self.threshold else None
+
+    def save(self, key, value, expires):
+        vector = key.reshape(1, -1)
+
+        self.vectors = np.concatenate([self.vectors, vector]) if self.vectors is not None else vector
+        self.entries.append((value, expires))
+
+        # Evict oldest entries
+        if len(self.entries) > self.count:
+            self.remove(len(self.entries) - self.count)
+
+    def expire(self, now):
+        """
+        Removes expired entries. Entries are ordered by insertion time and share the same time-to-live, so expired entries are
+        always at the front.
+
+        Args:
+            now: current time
+        """
+
+        count = 0
+        while count < len(self.entries) and self.entries[count][1] and self.entries[count][1] < now:
+            count += 1
+
+        if count:
+            self.remove(count)
+
+    def remove(self, count):
+        """
+        Removes the oldest entries.
+
+        Args:
+            count: number of entries to remove
+        """
+
+        self.vectors = self.vectors[count:] if count < len(self.entries) else None
+        self.entries = self.entries[count:]
+
+    def vector(self, text):
+        """
+        Transforms text into a normalized vector.
+
+        Args:
+            text: input text
+
+        Returns:
+            vector
+        """
+
+        vector = np.asarray(self.transform(" ".join(text.split())), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+
+        return vector / norm if norm else vector
@@ -0,0 +1,89 @@
+"""
+SQLite module
+"""
+
+import json
+import os
+import sqlite3
+
+from .base import Cache
+
+
+class SQLiteCache(Cache):
+    """
+    On-disk cache backed by SQLite. Cached values survive restarts. Values must be JSON serializable.
+    """
+
+    def __init__(self, config):
+        super().__init__(config)
+
+        path = config.get("path", "cache.sqlite")
+
+        # Create parent directory, if necessary
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Connection is shared by action worker threads, access is serialized with the cache lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, size INTEGER, expires REAL, accessed INTEGER)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache(accessed)")
+
+        # Current total size and access counter
+        self.bytes, self.counter = self.connection.execute("SELECT COALESCE(SUM(size), 0), COALESCE(MAX(accessed), 0) FROM cache").fetchone()
+
+    def load(self, key, now):
+        row = self.connection.execute("SELECT value, expires FROM cache WHERE key = ?", [key]).fetchone()
+        if not row:
+            return None
+
+        value, expires = row
+
+        # Remove expired values
+        if expires and expires < now:
+            self.remove(key)
+            self.connection.commit()
+            return None
+
+        # Mark as most recently used
+        self.counter += 1
+        self.connection.execute("UPDATE cache SET accessed = ? WHERE key = ?", [self.counter, key])
+        self.connection.commit()
+
+        return json.loads(value)
+
+    def save(self, key, value, expires):
+        # Replace existing value
+        self.remove(key)
+
+        value = json.dumps(value)
+        size = len(value.encode("utf-8"))
+
+        self.counter += 1
+        self.connection.execute("INSERT INTO cache VALUES (?, ?, ?, ?, ?)", [key, value, size, expires, self.counter])
+        self.bytes += size
+
+        # Evict least recently used values
+        while self.size and self.bytes > self.size:
+            row = self.connection.execute("SELECT key FROM cache ORDER BY accessed LIMIT 1").fetchone()
+            if not row:
+                break
+
+            self.remove(row[0])
+
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def remove(self, key):
+        """
+        Removes a key from the cache.
+
+        Args:
+            key: cache key
+        """
+
+        row = self.connection.execute("SELECT size FROM cache WHERE key = ?", [key]).fetchone()
+        if row:
+            self.connection.execute("DELETE FROM cache WHERE key = ?", [key])
+            self.bytes -= row[0]
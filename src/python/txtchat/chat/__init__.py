@@ -5,4 +5,5 @@ Chat imports
 from .base import Chat
 from .factory import ChatFactory
 from .mattermost import Mattermost
+from .recorder import Recorder
 from .rocketchat import RocketChat
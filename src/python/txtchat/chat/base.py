@@ -3,13 +3,57 @@ Chat module
 """
 
 import asyncio
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import random
+import time
+import traceback
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
 
+import httpx
+
+from ..metrics import registry
+from ..tracing import profiler, tracer
+
+from .limiter import Limiter
+from .recorder import Recorder
+from .scheduler import Scheduler
+
+# Conditional import
+try:
+    # pylint: disable=W0611
+    import h2
+
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+try:
+    import orjson
+
+    ORJSON = True
+except ImportError:
+    ORJSON = False
+
+# Logging configuration
+logger = logging.getLogger(__name__)
+
+
+# pylint: disable=R0904
 class Chat:
     """
     Base chat provider class.
     """
 
+    # Default respond trace, starts a new trace when respond is called without a message trace
+    NEWTRACE = object()
+
     def __init__(self, config, action):
         """
         Creates a new chat provider.
@@ -25,6 +69,32 @@ class Chat:
         # Action to execute
         self.action = action
 
+        # Maximum number of concurrently running actions
+        self.workers = config.get("workers") or 4
+
+        # REST API client, created by chat providers with httpclient
+        self.client = None
+
+        # Action executor, message scheduler and traffic recorder, created when the main loop starts
+        self.executor, self.scheduler, self.recorder = None, None, None
+
+        # Running background tasks
+        self.tasks = set()
+
+        # Metric labels and number of messages in progress
+        self.labels = {"provider": type(self).__name__.lower(), "action": config.get("name")}
+        self.inflight = 0
+
+        # Reconnect attempts since the last successful connection and recently processed message ids
+        self.attempts, self.seen = 0, OrderedDict()
+
+        # Outbound rate limits, a global limiter and a limiter per channel
+        limits = config.get("ratelimit", {})
+        self.limiter, self.limiters = Limiter(limits.get("rate"), limits.get("burst")), OrderedDict()
+
+        # Last typing indicator time per channel
+        self.typed = OrderedDict()
+
     def run(self):
         """
         Starts the chat session and main processing loop.
@@ -38,11 +108,41 @@ class Chat:
         Main processing loop.
         """
 
+        # Run actions in a worker pool to keep the event loop responsive
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="action")
+
+        # Per-session ordered message queues
+        config = self.config.get("scheduler", {})
+        self.scheduler = Scheduler(
+            self.respond,
+            self.busy,
+            config.get("inflight", self.workers),
+            config.get("depth", 10),
+            config.get("overflow", "drop"),
+        )
+
+        # Record traffic for replay, if enabled
+        config = self.config.get("record")
+        if config:
+            config = config if isinstance(config, dict) else {"path": config}
+            self.recorder = Recorder(config["path"], config.get("responses", False))
+
+        # Report queue metrics
+        registry.register(self.collect)
+
         try:
             await self.start()
         finally:
             await self.finish()
 
+            # Stop action executor
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+            if self.recorder:
+                self.recorder.close()
+
+            registry.unregister(self.collect)
+
     async def start(self):
         """
         Starts a new chat session.
@@ -56,3 +156,522 @@ class Chat:
         """
 
         raise NotImplementedError
+
+    def httpclient(self, **kwargs):
+        """
+        Creates an async HTTP client with the connection pool, keep-alive, HTTP/2 and timeout settings from the http connection
+        configuration.
+
+        Args:
+            kwargs: additional client arguments
+
+        Returns:
+            httpx.AsyncClient
+        """
+
+        config = self.config.get("http", {})
+
+        http2 = config.get("http2", False)
+        if http2 and not HTTP2:
+            logger.warning("HTTP/2 requires the h2 package, install with pip install httpx[http2]. Using HTTP/1.1.")
+            http2 = False
+
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(config.get("timeout", 30.0), connect=config.get("connect", 10.0)),
+            limits=httpx.Limits(
+                max_connections=config.get("connections", 100),
+                max_keepalive_connections=config.get("keepalive", 20),
+                keepalive_expiry=config.get("expiry", 5.0),
+            ),
+            http2=http2,
+            **kwargs,
+        )
+
+    def timeout(self, call):
+        """
+        Gets the timeout for a REST API call type.
+
+        Args:
+            call: call type (typing, send or update)
+
+        Returns:
+            timeout in seconds or the client default
+        """
+
+        timeouts = self.config.get("http", {}).get("timeouts", {})
+        return timeouts[call] if call in timeouts else httpx.USE_CLIENT_DEFAULT
+
+    async def request(self, method, url, **kwargs):
+        """
+        Runs an idempotent REST API request. Requests that fail with a network error, a 5xx or a 429 response are retried.
+        Retry-After headers are honored, otherwise retries use exponential backoff.
+
+        Args:
+            method: HTTP method
+            url: request url
+            kwargs: additional request arguments
+
+        Returns:
+            response
+        """
+
+        retries = self.config.get("http", {}).get("retries", 3)
+
+        for attempt in range(retries + 1):
+            delay = min(0.5 * 2**attempt, 30.0)
+
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.TransportError:
+                if attempt == retries:
+                    raise
+            else:
+                # Pause outbound requests when the server rate limit is exhausted
+                self.ratelimit(response)
+
+                if response.status_code not in (429, 500, 502, 503, 504) or attempt == retries:
+                    return response.raise_for_status()
+
+                delay = self.retryafter(response, delay)
+
+            logger.warning("Retrying %s %s in %.2f seconds", method, url, delay)
+            await asyncio.sleep(delay)
+
+        # Unreachable, the last attempt either returns or raises
+        return None
+
+    def ratelimit(self, response):
+        """
+        Reads server rate limit headers and pauses outbound requests when the rate limit is exhausted.
+
+        Args:
+            response: response
+        """
+
+        if response.status_code == 429:
+            self.limiter.pause(self.retryafter(response, 1.0))
+            return
+
+        remaining, reset = response.headers.get("X-RateLimit-Remaining"), response.headers.get("X-RateLimit-Reset")
+        if remaining == "0" and reset:
+            # Reset is either seconds until reset, epoch seconds or epoch milliseconds
+            try:
+                reset = float(reset)
+            except ValueError:
+                return
+
+            delay = reset / 1000 - time.time() if reset > 1e12 else reset - time.time() if reset > 1e9 else reset
+            self.limiter.pause(min(max(delay, 0.0), 60.0))
+
+    def retryafter(self, response, default):
+        """
+        Reads the Retry-After header of a response.
+
+        Args:
+            response: response
+            default: default delay in seconds
+
+        Returns:
+            delay in seconds
+        """
+
+        value = response.headers.get("Retry-After")
+        if not value:
+            return default
+
+        # Retry-After is either a number of seconds or a HTTP date
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return default
+
+        return min(max(delay, 0.0), 60.0)
+
+    async def backoff(self):
+        """
+        Waits before reconnecting. The delay grows exponentially with each failed attempt up to a maximum. Full jitter spreads out
+        reconnects from many clients after a server restart.
+        """
+
+        config = self.config.get("reconnect", {})
+        delay = random.uniform(0, min(config.get("maximum", 60.0), config.get("delay", 1.0) * 2 ** min(self.attempts, 32)))
+        self.attempts += 1
+
+        registry.increment("txtchat_reconnects_total", **self.labels)
+        logger.warning("Reconnecting in %.2f seconds (attempt %d)", delay, self.attempts)
+
+        await asyncio.sleep(delay)
+
+    def duplicate(self, uid):
+        """
+        Checks if a message was already processed. Messages can be received both live and while catching up after a reconnect.
+
+        Args:
+            uid: message id
+
+        Returns:
+            True if this message was already processed
+        """
+
+        if uid is None:
+            return False
+
+        if uid in self.seen:
+            return True
+
+        # Keep a bounded list of recent message ids
+        self.seen[uid] = None
+        if len(self.seen) > 1000:
+            self.seen.popitem(last=False)
+
+        return False
+
+    def accept(self, frame):
+        """
+        Checks if a raw websocket frame needs to be processed. Chat providers override this method to skip events they ignore
+        without decoding them.
+
+        Args:
+            frame: raw websocket frame
+
+        Returns:
+            True if frame should be decoded and processed
+        """
+
+        # pylint: disable=W0613
+        return True
+
+    def decode(self, data):
+        """
+        Decodes JSON data. Uses orjson, if available.
+
+        Args:
+            data: JSON string or bytes
+
+        Returns:
+            decoded data
+        """
+
+        # pylint: disable=E1101
+        return orjson.loads(data) if ORJSON else json.loads(data)
+
+    def submit(self, channel, message):
+        """
+        Schedules a response to message. Messages in the same channel are processed in order. This method returns immediately so
+        the caller can continue reading from the chat connection.
+
+        Args:
+            channel: channel to respond to
+            message: incoming message text
+        """
+
+        registry.increment("txtchat_messages_total", **self.labels)
+
+        if self.recorder:
+            self.recorder.message(channel, message)
+
+        # Carry the active trace through the message queue
+        traces = tracer.traces()
+        self.scheduler.add(channel, message, traces[0] if traces else None)
+
+    def background(self, coroutine):
+        """
+        Runs coroutine as a background task.
+
+        Args:
+            coroutine: coroutine to run
+        """
+
+        task = asyncio.create_task(coroutine)
+
+        # Keep a reference to the task until it completes
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def busy(self, channel, message):
+        """
+        Replies with a busy message when a message is rejected by the scheduler.
+
+        Args:
+            channel: channel to respond to
+            message: rejected message text
+        """
+
+        # pylint: disable=W0613
+        response = self.config.get("scheduler", {}).get("busy", "I'm busy with your previous requests, try again soon")
+        self.background(self.send(channel, response))
+
+    async def respond(self, channel, message, received=None, trace=NEWTRACE):
+        """
+        Generates and sends a response to message.
+
+        Args:
+            channel: channel to respond to
+            message: incoming message text
+            received: monotonic time message was received, if available
+            trace: message trace, None if the message isn't traced. A new trace is started if not provided.
+        """
+
+        with tracer.activate(tracer.start() if trace is Chat.NEWTRACE else trace):
+            await self.generate(channel, message, received)
+
+    async def generate(self, channel, message, received):
+        """
+        Generates and sends a response to message within the active trace.
+
+        Args:
+            channel: channel to respond to
+            message: incoming message text
+            received: monotonic time message was received, if available
+        """
+
+        self.inflight += 1
+
+        start = time.monotonic()
+        received = received if received else start
+        registry.observe("txtchat_queue_seconds", start - received, **self.labels)
+
+        traces = tracer.traces()
+        for trace in traces:
+            trace.add("queue", received, start)
+
+        # Send typing indicator without waiting for it
+        indicator = asyncio.create_task(self.indicate(channel))
+
+        # pylint: disable=W0703
+        try:
+            # Generate response while user sees typing indicator
+            with tracer.span("execute"):
+                response = await self.execute(message, channel)
+
+            executed = time.monotonic()
+            registry.observe("txtchat_execute_seconds", executed - start, **self.labels)
+
+            # Skip typing indicators that haven't been sent yet to avoid showing them after the response
+            indicator.cancel()
+
+            # Send response
+            with tracer.span("send"):
+                if inspect.isgenerator(response):
+                    response = await self.stream(channel, response)
+                else:
+                    await self.send(channel, response)
+
+            end = time.monotonic()
+            registry.observe("txtchat_send_seconds", end - executed, **self.labels)
+            registry.observe("txtchat_latency_seconds", end - received, **self.labels)
+
+            if self.recorder:
+                self.recorder.response(
+                    channel, response, queue=start - received, execute=executed - start, send=end - executed, latency=end - received
+                )
+
+        except Exception:
+            registry.increment("txtchat_errors_total", stage="respond", **self.labels)
+            logger.error(traceback.format_exc())
+
+        finally:
+            self.settle(indicator)
+            self.inflight -= 1
+
+            for trace in traces:
+                tracer.finish(trace)
+
+    def settle(self, indicator):
+        """
+        Cancels a typing indicator still in progress and logs typing indicator errors.
+
+        Args:
+            indicator: typing indicator task
+        """
+
+        if not indicator.done():
+            indicator.cancel()
+        elif not indicator.cancelled() and indicator.exception():
+            logger.warning("Typing indicator failed: %s", indicator.exception())
+
+    def collect(self):
+        """
+        Reports current queue depth and in-progress message count metrics.
+        """
+
+        registry.gauge("txtchat_queue_depth", len(self.scheduler), **self.labels)
+        registry.gauge("txtchat_inflight", self.inflight, **self.labels)
+
+    async def execute(self, message, session):
+        """
+        Runs action for message in the action executor.
+
+        Args:
+            message: input message text
+            session: session id
+
+        Returns:
+            action response
+        """
+
+        # Run in a copy of the current context to keep the active trace in the worker thread
+        loop, context = asyncio.get_running_loop(), contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, context.run, functools.partial(profiler, self.action, message, session=session))
+
+    async def stream(self, channel, response):
+        """
+        Sends a streaming response. A placeholder message is posted and then edited in place as output is generated.
+        Edits are throttled to the configured edit rate.
+
+        Args:
+            channel: channel to send message
+            response: generator of partial responses, each element is the full response text generated so far
+
+        Returns:
+            final response text
+        """
+
+        loop, context, end = asyncio.get_running_loop(), contextvars.copy_context(), object()
+
+        # Minimum time between message edits
+        interval = 1.0 / self.config.get("editrate", 2.0)
+
+        # Post placeholder message
+        uid = await self.send(channel, self.config.get("placeholder", "..."))
+
+        text, sent, last = None, None, time.monotonic()
+        while (partial := await loop.run_in_executor(self.executor, context.run, next, response, end)) is not end:
+            text = partial
+            if text and text != sent and time.monotonic() - last >= interval:
+                await self.update(channel, uid, text)
+                sent, last = text, time.monotonic()
+
+        # Replace the placeholder when no output was generated
+        if not text:
+            text = self.config.get("fallback", "I had an error processing this request")
+
+        # Send final response
+        if text != sent:
+            await self.update(channel, uid, text)
+
+        return text
+
+    async def send(self, channel, message):
+        """
+        Sends a message once outbound rate limits allow it. Messages wait in line instead of being dropped.
+
+        Args:
+            channel: channel to send message
+            message: message to send
+
+        Returns:
+            message id
+        """
+
+        await self.throttle(channel)
+
+        # New messages clear the typing indicator
+        self.typed.pop(channel, None)
+
+        return await self.sendmessage(channel, message)
+
+    async def update(self, channel, uid, message):
+        """
+        Updates a previously sent message once outbound rate limits allow it.
+
+        Args:
+            channel: channel of message
+            uid: message id
+            message: new message text
+        """
+
+        await self.throttle(channel)
+        await self.updatemessage(channel, uid, message)
+
+    async def indicate(self, channel):
+        """
+        Sends a typing indicator. Repeated typing indicators for the same channel are coalesced and typing indicators are skipped
+        while outbound requests are paused.
+
+        Args:
+            channel: channel to send typing indicator
+        """
+
+        now, interval = time.monotonic(), self.config.get("ratelimit", {}).get("typing", 3.0)
+        if self.limiter.ispaused() or (channel in self.typed and now - self.typed[channel] < interval):
+            return
+
+        self.track(self.typed, channel, now)
+        await self.typing(channel)
+
+    async def throttle(self, channel):
+        """
+        Waits for the global and per channel outbound rate limits.
+
+        Args:
+            channel: channel of request
+        """
+
+        start, limits = time.monotonic(), self.config.get("ratelimit", {})
+
+        # Per channel limit
+        if limits.get("channel"):
+            limiter = self.limiters.get(channel) or Limiter(limits["channel"], limits.get("channelburst"))
+            self.track(self.limiters, channel, limiter)
+            await limiter.acquire()
+
+        # Global limit
+        await self.limiter.acquire()
+
+        registry.observe("txtchat_ratelimit_seconds", time.monotonic() - start, **self.labels)
+
+    def track(self, data, key, value):
+        """
+        Stores a per channel value in a bounded dictionary. The least recently used channel is removed when full.
+
+        Args:
+            data: ordered dictionary
+            key: channel
+            value: value to store
+        """
+
+        data[key] = value
+        data.move_to_end(key)
+
+        if len(data) > 1000:
+            data.popitem(last=False)
+
+    async def typing(self, channel):
+        """
+        Sends a typing indicator event.
+
+        Args:
+            channel: channel to send typing indicator
+        """
+
+        raise NotImplementedError
+
+    async def sendmessage(self, channel, message):
+        """
+        Sends a message.
+
+        Args:
+            channel: channel to send message
+            message: message to send
+
+        Returns:
+            message id
+        """
+
+        raise NotImplementedError
+
+    async def updatemessage(self, channel, uid, message):
+        """
+        Updates the text of a previously sent message.
+
+        Args:
+            channel: channel of message
+            uid: message id
+            message: new message text
+        """
+
+        raise NotImplementedError
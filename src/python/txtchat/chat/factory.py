@@ -26,7 +26,7 @@ class ChatFactory:
 
         # Chat instance
         chat = None
-        provider = config.get("provider")
+        provider = ChatFactory.provider(config)
 
         # Create chat instance
         if provider == "mattermost":
@@ -35,3 +35,17 @@ class ChatFactory:
             chat = RocketChat(config, action)
 
         return chat
+
+    @staticmethod
+    def provider(config):
+        """
+        Gets the chat provider name for a chat configuration. RocketChat is the default provider.
+
+        Args:
+            config: chat configuration
+
+        Returns:
+            provider name
+        """
+
+        return "mattermost" if config.get("provider") == "mattermost" else "rocketchat"
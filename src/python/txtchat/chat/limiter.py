@@ -0,0 +1,79 @@
+"""
+Limiter module
+"""
+
+import asyncio
+import time
+
+
+class Limiter:
+    """
+    Async token bucket rate limiter. Tokens are added at a fixed rate up to a maximum burst size and each request takes one token.
+    Requests can also be paused for a period of time, for example when a server reports its rate limit is exhausted.
+    """
+
+    def __init__(self, rate=None, burst=None):
+        """
+        Creates a new Limiter.
+
+        Args:
+            rate: requests per second, None for no limit
+            burst: maximum number of requests sent at once, defaults to max(rate, 1)
+        """
+
+        self.rate = rate
+        self.burst = burst if burst else max(rate, 1) if rate else None
+
+        # Available tokens and last refill time
+        self.tokens, self.updated = self.burst, time.monotonic()
+
+        # Requests wait until this time
+        self.paused = 0.0
+
+    async def acquire(self):
+        """
+        Waits until a request can be sent.
+        """
+
+        while True:
+            now = time.monotonic()
+
+            # Wait for pause to end
+            if now < self.paused:
+                await asyncio.sleep(self.paused - now)
+                continue
+
+            # No rate limit
+            if not self.rate:
+                return
+
+            # Refill tokens
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+
+            # Wait for the next token
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """
+        Pauses requests.
+
+        Args:
+            seconds: number of seconds to pause
+        """
+
+        self.paused = max(self.paused, time.monotonic() + seconds)
+
+    def ispaused(self):
+        """
+        Checks if requests are paused.
+
+        Returns:
+            True if requests are paused
+        """
+
+        return time.monotonic() < self.paused
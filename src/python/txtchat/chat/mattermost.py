@@ -2,13 +2,21 @@
 Mattermost module
 """
 
+import asyncio
 import json
 import logging
+import re
+import time
+import uuid
 
 import httpx
 import websockets
 
-from websockets.exceptions import ConnectionClosedOK, ConnectionClosed
+from websockets.exceptions import WebSocketException
+
+from ..cache import MemoryCache
+from ..metrics import registry
+from ..tracing import tracer
 
 from .base import Chat
 
@@ -21,6 +29,10 @@ class Mattermost(Chat):
     Chat provider for Mattermost.
     """
 
+    # Event type at the start of a websocket frame and the channel type of a posted event
+    EVENT = re.compile(r'\s*\{\s*"event"\s*:\s*"([^"\\]*)"')
+    CHANNELTYPE = re.compile(r'"channel_type"\s*:\s*"([^"\\]*)"')
+
     def __init__(self, config, action):
         super().__init__(config, action)
 
@@ -31,26 +43,39 @@ class Mattermost(Chat):
         self.headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
 
         # Use async httpx client
-        self.client = httpx.AsyncClient(headers=self.headers, timeout=30.0)
+        self.client = self.httpclient(headers=self.headers)
 
         # State information
         self.userid = None
-        self.channels = set()
+
+        # Channel id -> channel type cache, each entry uses one byte of the cache size
+        self.channels = MemoryCache({"size": 10000, "ttl": 3600, **config.get("channels", {})})
+
+        # Latest post time seen in milliseconds, used to catch up on posts missed while disconnected
+        self.last = None
+
+        # Start of a catch up that didn't finish, retried on the next connection
+        self.missed = None
 
     async def start(self):
         while True:
             try:
-                # Get user id
-                response = await self.client.get(f"{self.baseurl}/api/v4/users/me")
-                data = response.raise_for_status().json()
+                # Get user id, reused across reconnects
+                if not self.userid:
+                    response = await self.client.get(f"{self.baseurl}/api/v4/users/me")
+                    data = response.raise_for_status().json()
+
+                    self.userid = data["id"]
+                    logger.info("Started as: %s (ID: %s)", data["username"], self.userid)
 
-                self.userid = data["id"]
-                logger.info("Started as: %s (ID: %s)", data["username"], self.userid)
+                    # Load channel types for all channels this user is a member of
+                    await self.prewarm()
 
                 await self.listen()
 
-            except (ConnectionClosedOK, ConnectionClosed):
-                logger.warning("WebSocket connection closed reconnecting...")
+            except (WebSocketException, OSError, httpx.HTTPError) as e:
+                logger.warning("Connection error: %s", e)
+                await self.backoff()
 
     async def finish(self):
         await self.client.aclose()
@@ -69,10 +94,25 @@ class Mattermost(Chat):
             # Send authentication challenge response
             await websocket.send(json.dumps({"seq": 1, "action": "authentication_challenge", "data": {"token": self.token}}))
             logger.info("WebSocket connected. Listening for messages...")
+            self.attempts = 0
+
+            # Process posts missed while disconnected in the background, the receive loop keeps reading the connection
+            catchup = asyncio.create_task(self.catchup())
 
-            # Process incoming messages
-            async for message in websocket:
-                await self.process(json.loads(message))
+            try:
+                # Process incoming messages
+                async for message in websocket:
+                    if not self.accept(message):
+                        continue
+
+                    with tracer.activate(tracer.start()):
+                        with tracer.span("receive"):
+                            message = self.decode(message)
+
+                        await self.process(message)
+
+            finally:
+                catchup.cancel()
 
     async def process(self, message):
         """
@@ -87,48 +127,139 @@ class Mattermost(Chat):
             post = data.get("post", {})
 
             # Parse post, if necessary
-            post = json.loads(post) if isinstance(post, str) else post
+            post = self.decode(post) if isinstance(post, str) else post
 
-            channel = post.get("channel_id")
-            message = post.get("message", "").strip()
+            await self.onpost(post, data.get("channel_type"))
 
-            # Skip messages own messages and non-direct messages
-            if post.get("user_id") != self.userid and (channel and message and await self.isdirect(channel)):
-                logger.info("Received DM: %s", message)
+    def accept(self, frame):
+        # Read event and channel types without decoding the frame. Fields nested in the encoded post are escaped and don't match.
+        event = Mattermost.EVENT.match(frame) if isinstance(frame, str) else None
+        if not event:
+            return True
 
-                # Send typing indicator
-                await self.typing(channel)
+        # Skip events other than new posts
+        if event.group(1) != "posted":
+            return False
 
-                # Generate response
-                response = self.action(message, session=channel)
+        # Skip posts in non-direct channels
+        ctype = Mattermost.CHANNELTYPE.search(frame)
+        return not ctype or ctype.group(1) == "D"
 
-                # Send response
-                await self.sendmessage(channel, response)
+    async def onpost(self, post, ctype=None):
+        """
+        Analyzes and responds to a post.
 
-    async def isdirect(self, channel):
+        Args:
+            post: post data
+            ctype: channel type, if available
         """
-        Checks if channel is a direct message channel. Caches responses.
+
+        channel = post.get("channel_id")
+        message = post.get("message", "").strip()
+
+        # Track latest post time
+        self.last = max(self.last or 0, post.get("create_at", 0))
+
+        # Skip own messages and empty messages
+        if post.get("user_id") == self.userid or not channel or not message:
+            return
+
+        with tracer.span("channel"):
+            direct = await self.isdirect(channel, ctype)
+
+        # Skip non-direct messages and messages already processed
+        if direct and not self.duplicate(post.get("id")):
+            logger.info("Received DM: %s", message)
+
+            # Generate and send response in the background
+            self.submit(channel, message)
+
+    async def catchup(self):
+        """
+        Processes posts sent to direct message channels while disconnected. Only channels with posts since the last post seen
+        are read.
+        """
+
+        # First connection or catch up disabled, only process new posts
+        if self.last is None or not self.config.get("catchup", True):
+            self.last = self.last if self.last else int(time.time() * 1000)
+            return
+
+        # Resume from the start of an unfinished catch up
+        since = min(self.last, self.missed) if self.missed else self.last
+        self.missed = since
+
+        # pylint: disable=W0703
+        try:
+            # Direct message channels with new posts
+            response = await self.client.get(f"{self.baseurl}/api/v4/users/me/channels")
+            channels = response.raise_for_status().json()
+
+            for channel in channels:
+                self.channels.put(channel["id"], channel.get("type", "?"))
+
+            for channel in [x["id"] for x in channels if x.get("type") == "D" and x.get("last_post_at", 0) > since]:
+                response = await self.client.get(f"{self.baseurl}/api/v4/channels/{channel}/posts", params={"since": since})
+                posts = response.raise_for_status().json().get("posts", {})
+
+                # Process new posts in order, edited posts are also returned and are skipped
+                for post in sorted(posts.values(), key=lambda x: x.get("create_at", 0)):
+                    if post.get("create_at", 0) > since:
+                        await self.onpost(post)
+
+            self.missed = None
+
+        except Exception as e:
+            logger.warning("Unable to catch up on missed posts, retrying on the next connection: %s", e)
+
+    async def prewarm(self):
+        """
+        Loads channel types for all channels this user is a member of into the channel cache.
+        """
+
+        if not self.config.get("prewarm", True):
+            return
+
+        response = await self.client.get(f"{self.baseurl}/api/v4/users/me/channels")
+        if response.is_success:
+            for channel in response.json():
+                self.channels.put(channel["id"], channel.get("type", "?"))
+
+            logger.info("Loaded %d channels", len(response.json()))
+        else:
+            logger.warning("Unable to load channels: HTTP %d", response.status_code)
+
+    async def isdirect(self, channel, ctype=None):
+        """
+        Checks if channel is a direct message channel. Channel types are cached.
 
         Args:
             channel: channel to check
+            ctype: channel type, if available
 
         Returns:
             True if this is a direct message, False otherwise
         """
 
+        # Cache channel type from event data
+        if ctype:
+            self.channels.put(channel, ctype)
+            return ctype == "D"
+
         # Cache channel info to avoid repeated API calls
-        if channel in self.channels:
-            return True
+        ctype = self.channels.get(channel)
+        registry.increment("txtchat_cache_requests_total", cache="channels", result="miss" if ctype is None else "hit", **self.labels)
 
-        response = await self.client.get(f"{self.baseurl}/api/v4/channels/{channel}")
-        channel = response.json()
+        if ctype is None:
+            response = await self.client.get(f"{self.baseurl}/api/v4/channels/{channel}")
+            ctype = response.json().get("type", "?") if response.is_success else "?"
 
-        # 'D' indicates direct message
-        if channel.get("type") == "D":
-            self.channels.add(channel.get("id"))
-            return True
+            # Skip caching server errors
+            if response.status_code < 500:
+                self.channels.put(channel, ctype)
 
-        return False
+        # 'D' indicates direct message
+        return ctype == "D"
 
     async def typing(self, channel):
         """
@@ -138,7 +269,7 @@ class Mattermost(Chat):
             channel: channel to send typing indicator
         """
 
-        await self.client.post(f"{self.baseurl}/api/v4/users/me/typing", json={"channel_id": channel})
+        await self.client.post(f"{self.baseurl}/api/v4/users/me/typing", json={"channel_id": channel}, timeout=self.timeout("typing"))
 
     async def sendmessage(self, channel, message):
         """
@@ -147,10 +278,28 @@ class Mattermost(Chat):
         Args:
             channel: channel to send message
             message: message to send
+
+        Returns:
+            post id
         """
 
-        message = {"channel_id": channel, "message": str(message)}
+        # Pending post id makes retries idempotent, the server ignores duplicate posts
+        message = {"channel_id": channel, "message": str(message), "pending_post_id": f"{self.userid}:{uuid.uuid4().hex}"}
 
-        response = await self.client.post(f"{self.baseurl}/api/v4/posts", json=message)
-        response.raise_for_status()
+        response = await self.request("POST", f"{self.baseurl}/api/v4/posts", json=message, timeout=self.timeout("send"))
+        post = response.json()
         logger.info("Sent response: %s", message)
+
+        return post.get("id")
+
+    async def updatemessage(self, channel, uid, message):
+        """
+        Updates the text of a previously sent message.
+
+        Args:
+            channel: channel of message
+            uid: post id
+            message: new message text
+        """
+
+        await self.request("PUT", f"{self.baseurl}/api/v4/posts/{uid}/patch", json={"message": str(message)}, timeout=self.timeout("update"))
@@ -0,0 +1,107 @@
+"""
+Recorder module
+"""
+
+import gzip
+import json
+import logging
+import time
+
+# Logging configuration
+logger = logging.getLogger(__name__)
+
+
+class Recorder:
+    """
+    Records chat traffic to a JSON lines log. Incoming messages are stored with their arrival time and responses are stored with
+    per-stage timings. Logs ending in .gz are compressed. Existing logs are appended to. Recorded logs can be replayed with
+    txtchat.benchmark.
+    """
+
+    def __init__(self, path, responses=False, interval=1.0):
+        """
+        Creates a new Recorder.
+
+        Args:
+            path: output path
+            responses: if True, response text is also stored
+            interval: minimum number of seconds between writes to disk
+        """
+
+        self.path = path
+        self.responses = responses
+        self.interval = interval
+
+        # Append to existing logs
+        # pylint: disable=R1732
+        self.output = gzip.open(path, "at", encoding="utf-8") if path.endswith(".gz") else open(path, "a", encoding="utf-8")
+
+        # Last time data was written to disk
+        self.flushed = time.monotonic()
+
+    def message(self, channel, text):
+        """
+        Records an incoming message.
+
+        Args:
+            channel: channel id
+            text: message text
+        """
+
+        self.write({"event": "message", "channel": channel, "text": text})
+
+    def response(self, channel, text, **timings):
+        """
+        Records a response.
+
+        Args:
+            channel: channel id
+            text: response text
+            timings: stage timings in seconds
+        """
+
+        entry = {"event": "response", "channel": channel, **{stage: round(value, 4) for stage, value in timings.items()}}
+        if self.responses:
+            entry["text"] = text
+
+        self.write(entry)
+
+    def write(self, entry):
+        """
+        Writes a log entry.
+
+        Args:
+            entry: log entry
+        """
+
+        # Wall clock time keeps entries ordered across restarts
+        self.output.write(json.dumps({"time": round(time.time(), 3), **entry}, separators=(",", ":")) + "\n")
+
+        # Limit the number of disk writes
+        now = time.monotonic()
+        if now - self.flushed >= self.interval:
+            self.output.flush()
+            self.flushed = now
+
+    def close(self):
+        """
+        Closes this recorder.
+        """
+
+        self.output.close()
+        logger.info("Recorded traffic to %s", self.path)
+
+    @staticmethod
+    def load(path):
+        """
+        Loads a recorded log.
+
+        Args:
+            path: input path
+
+        Returns:
+            list of log entries
+        """
+
+        with gzip.open(path, "rt", encoding="utf-8") if path.endswith(".gz") else open(path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
@@ -2,15 +2,22 @@
 RocketChat module
 """
 
+import asyncio
 import hashlib
 import json
 import logging
+import os
+import re
 import time
 
+from datetime import datetime, timezone
+
 import httpx
 import websockets
 
-from websockets.exceptions import ConnectionClosedOK, ConnectionClosed
+from websockets.exceptions import WebSocketException
+
+from ..tracing import tracer
 
 from .base import Chat
 
@@ -23,6 +30,9 @@ class RocketChat(Chat):
     Chat provider for RocketChat.
     """
 
+    # DDP message type at the start of a websocket frame
+    MESSAGETYPE = re.compile(r'\s*\{\s*"msg"\s*:\s*"([^"\\]*)"')
+
     def __init__(self, config, action):
         super().__init__(config, action)
 
@@ -34,23 +44,49 @@ class RocketChat(Chat):
         self.password = config.get("password")
 
         # Use async httpx client
-        self.client = httpx.AsyncClient(timeout=30.0)
+        self.client = self.httpclient()
 
         # Authentication token
         self.userid = None
         self.token = None
 
+        # Open websocket connection
+        self.websocket = None
+
+        # Latest message time seen in milliseconds, used to catch up on messages missed while disconnected
+        self.last = None
+
+        # Start of a catch up that didn't finish, retried on the next connection
+        self.missed = None
+
+        # Direct message room registry, optionally persisted to a file
+        self.registry, self.rooms, self.updated = config.get("rooms"), set(), None
+        self.loadrooms()
+
+        # Direct message rooms changed since the last catch up, only these rooms can have missed messages
+        self.changed = set()
+
     async def start(self):
         while True:
             try:
-                # Login via REST API to get token
-                await self.login()
+                # Login via REST API to get token, token is reused across reconnects
+                if not self.token:
+                    await self.login()
 
                 # Start websocket listener
                 await self.listen()
 
-            except (ConnectionClosedOK, ConnectionClosed):
-                logger.warning("WebSocket connection closed reconnecting...")
+            except httpx.HTTPStatusError as e:
+                # Login again when the token is no longer valid
+                if e.response.status_code == 401:
+                    self.token = None
+
+                logger.warning("Request error: %s", e)
+                await self.backoff()
+
+            except (WebSocketException, OSError, httpx.HTTPError) as e:
+                logger.warning("Connection error: %s", e)
+                await self.backoff()
 
     async def finish(self):
         await self.client.aclose()
@@ -83,6 +119,8 @@ class RocketChat(Chat):
         logger.info("Connecting to WebSocket: %s", url)
 
         async with websockets.connect(url) as websocket:
+            self.websocket = websocket
+
             # Login to server
             await self.connect(websocket)
 
@@ -90,10 +128,25 @@ class RocketChat(Chat):
             await self.subscribe(websocket)
 
             logger.info("Listening for messages...")
+            self.attempts = 0
 
-            # Process incoming messages
-            async for message in websocket:
-                await self.process(json.loads(message), websocket)
+            # Process messages missed while disconnected in the background, the receive loop keeps answering pings
+            catchup = asyncio.create_task(self.catchup())
+
+            try:
+                # Process incoming messages
+                async for message in websocket:
+                    if not self.accept(message):
+                        continue
+
+                    with tracer.activate(tracer.start()):
+                        with tracer.span("receive"):
+                            message = self.decode(message)
+
+                        await self.process(message, websocket)
+
+            finally:
+                catchup.cancel()
 
     async def connect(self, websocket):
         """
@@ -117,31 +170,50 @@ class RocketChat(Chat):
         response = await websocket.recv()
         logger.info("Login response: %s", response)
 
+        # Login again when the token is no longer valid
+        result = json.loads(response)
+        if result.get("msg") == "result" and result.get("error"):
+            self.token = None
+            raise ConnectionError("WebSocket login failed")
+
     async def subscribe(self, websocket):
         """
-        Subscribes to new messages.
+        Subscribes to new messages. The room registry is updated with rooms changed since the last update. Messages in all rooms
+        are received with a single subscription, so the number of subscriptions doesn't grow with the number of rooms.
 
         Args:
             websocket: open websocket connection
         """
 
-        # Get rooms list
-        response = await self.client.get(f"{self.baseurl}/api/v1/rooms.get")
+        # Get rooms changed since the last update
+        params = {"updatedSince": self.updated} if self.updated else {}
+        response = await self.client.get(f"{self.baseurl}/api/v1/rooms.get", params=params)
         result = response.raise_for_status().json()
 
-        logger.info("Rooms API response: %s", result)
+        # Update room registry, 'c' for channel, 'd' for direct
+        update, remove = result.get("update", []), result.get("remove", [])
+        direct = {room["_id"] for room in update if room.get("t", "c") == "d"}
+        self.rooms.update(direct)
+        self.rooms.difference_update(room["_id"] for room in remove)
+
+        # Rooms with new messages are also updated
+        self.changed.update(direct)
+        self.changed.difference_update(room["_id"] for room in remove)
+
+        # Track latest room change
+        times = [x for room in update + remove for x in [room.get("_updatedAt"), room.get("_deletedAt")] if isinstance(x, str)]
+        self.updated = max(times + ([self.updated] if self.updated else []), default=None)
 
-        # Get rooms
-        rooms = result["update"] if "update" in result else []
+        if update or remove:
+            self.saverooms()
 
-        for room in rooms:
-            # 'c' for channel, 'd' for direct
-            rid, rtype = room["_id"], room.get("t", "c")
+        logger.info("Room registry has %d direct rooms (%d updated, %d removed)", len(self.rooms), len(update), len(remove))
 
-            if rtype == "d":
-                # Subscribe to room messages
-                await websocket.send(json.dumps({"msg": "sub", "id": f"sub_{rid}", "name": "stream-room-messages", "params": [rid, False]}))
-                logger.info("Subscribed to room: %s (%s)", room.get("name", rid), rtype)
+        # Subscribe to messages in all rooms of this user
+        message = {"msg": "sub", "id": "my_messages_sub", "name": "stream-room-messages", "params": ["__my_messages__", False]}
+
+        await websocket.send(json.dumps(message))
+        logger.info("Subscribed to room messages")
 
         # Subscribe to new channel changes
         await self.subscribechannels(websocket)
@@ -176,20 +248,25 @@ class RocketChat(Chat):
             if args:
                 collection = message.get("collection")
                 if collection == "stream-room-messages":
-                    await self.onmessage(args[0], websocket)
+                    await self.onmessage(args[0], args[1] if len(args) > 1 else None)
                 elif collection == "stream-notify-user":
-                    await self.onchannel(args, websocket)
+                    await self.onchannel(args)
         elif mtype == "ping":
             # Respond to ping with pong
             await websocket.send(json.dumps({"msg": "pong"}))
 
-    async def onmessage(self, event, websocket):
+    def accept(self, frame):
+        # Read the DDP message type without decoding the frame, only changed and ping messages are processed
+        mtype = RocketChat.MESSAGETYPE.match(frame) if isinstance(frame, str) else None
+        return not mtype or mtype.group(1) in ("changed", "ping")
+
+    async def onmessage(self, event, room=None):
         """
         Analyzes and responds to an incoming message.
 
         Args:
             event: incoming message event
-            websocket: open websocket connection
+            room: room information sent with the message, if available
         """
 
         # Skip messages own messages
@@ -199,75 +276,207 @@ class RocketChat(Chat):
         rid = event.get("rid")
         message = event.get("msg", "").strip()
 
-        if rid and message:
+        # Track latest message time
+        self.last = max(self.last or 0, self.timestamp(event.get("ts")))
+
+        # Skip messages outside of direct message rooms, room types are sent with messages in newer server versions
+        direct = room["roomType"] == "d" if room and "roomType" in room else rid in self.rooms
+
+        if rid and message and direct and not self.duplicate(event.get("_id")):
             logger.info("Received DM: %s", message)
 
-            # Send typing indicator
-            await self.typing(rid, websocket)
+            # Generate and send response in the background
+            self.submit(rid, message)
+
+    async def catchup(self):
+        """
+        Processes messages sent to direct message rooms while disconnected. Only rooms changed since the last catch up are read.
+        """
+
+        # First connection or catch up disabled, only process new messages
+        if self.last is None or not self.config.get("catchup", True):
+            self.last = self.last if self.last else int(time.time() * 1000)
+            self.changed.clear()
+            return
+
+        # Resume from the start of an unfinished catch up
+        since = min(self.last, self.missed) if self.missed else self.last
+        oldest = datetime.fromtimestamp(since / 1000, tz=timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+        self.missed = since
 
-            # Generate response while user sees typing indicator
-            response = self.action(message, session=rid)
+        # pylint: disable=W0703
+        try:
+            for rid in list(self.changed):
+                # Process messages in order
+                for event in await self.history(rid, oldest):
+                    if self.timestamp(event.get("ts")) > since:
+                        await self.onmessage(event)
 
-            # Send the message via REST API to ensure delivery as websocket can sometimes be closed
-            await self.sendmessage(rid, response)
+                self.changed.discard(rid)
 
-    async def onchannel(self, args, websocket):
+            self.missed = None
+
+        except Exception as e:
+            logger.warning("Unable to catch up on missed messages, retrying on the next connection: %s", e)
+
+    async def history(self, rid, oldest, count=100):
         """
-        Analyzes an incoming channel change event.
+        Reads all messages in a direct message room newer than oldest. Pages back from the newest message until the full backlog
+        is read.
+
+        Args:
+            rid: room id
+            oldest: ISO 8601 time, only messages newer than this time are read
+            count: number of messages per page
+
+        Returns:
+            messages ordered oldest first
+        """
+
+        messages = []
+        while True:
+            # Pages are ordered newest first, messages that arrive while paging can repeat and are skipped as duplicates
+            params = {"roomId": rid, "oldest": oldest, "count": count, "offset": len(messages)}
+            response = await self.client.get(f"{self.baseurl}/api/v1/im.history", params=params)
+            page = response.raise_for_status().json().get("messages", [])
+
+            messages.extend(page)
+            if len(page) < count:
+                break
+
+        return sorted(messages, key=lambda x: self.timestamp(x.get("ts")))
+
+    def timestamp(self, ts):
+        """
+        Parses a message timestamp. Realtime API messages use {"$date": milliseconds} and REST API messages use ISO 8601 strings.
+
+        Args:
+            ts: message timestamp
+
+        Returns:
+            milliseconds since the epoch
+        """
+
+        if isinstance(ts, dict):
+            return ts.get("$date", 0)
+
+        if isinstance(ts, str):
+            return int(datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp() * 1000)
+
+        return 0
+
+    async def onchannel(self, args):
+        """
+        Analyzes an incoming channel change event and updates the room registry.
 
         Args:
             args: incoming event data
-            websocket: open websocket connection
         """
 
         if not args or len(args) < 2:
             return
 
         etype, data = args[0], args[1]
-        if etype != "removed":
-            rid = data.get("_id")
-            rtype = data.get("t")
+        rid, rtype = data.get("_id"), data.get("t")
+
+        if etype == "removed":
+            # Remove deleted rooms
+            if rid in self.rooms:
+                self.rooms.discard(rid)
+                self.saverooms()
+
+                logger.info("Removed direct channel: %s", rid)
+
+        elif rtype == "d" and rid and rid not in self.rooms:
+            # Add new direct channels
+            self.rooms.add(rid)
+            self.saverooms()
+
+            logger.info("Added direct channel: %s", rid)
+
+    def loadrooms(self):
+        """
+        Loads the room registry, if persisted.
+        """
 
-            # Subscribe if this is a new channel
-            if rtype == "d" and rid:
-                # Subscribe to room messages
-                await websocket.send(json.dumps({"msg": "sub", "id": f"sub_{rid}", "name": "stream-room-messages", "params": [rid, False]}))
-                logger.info("Subscribed to new direct channel: %s", rid)
+        if self.registry and os.path.exists(self.registry):
+            with open(self.registry, "r", encoding="utf-8") as f:
+                data = json.load(f)
 
-    async def typing(self, rid, websocket):
+            self.rooms, self.updated = set(data.get("rooms", [])), data.get("updated")
+            logger.info("Loaded %d rooms from %s", len(self.rooms), self.registry)
+
+    def saverooms(self):
+        """
+        Saves the room registry, if persisted. The file is replaced atomically.
+        """
+
+        if self.registry:
+            path = f"{self.registry}.tmp"
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"updated": self.updated, "rooms": sorted(self.rooms)}, f)
+
+            os.replace(path, self.registry)
+
+    async def typing(self, channel):
         """
         Sends a typing indicator event.
 
         Args:
-            rid: room id
-            websocket: open websocket connection
+            channel: room id
         """
 
-        await websocket.send(
+        await self.websocket.send(
             json.dumps(
                 {
                     "msg": "method",
                     "method": "stream-notify-room",
                     "id": f"typing_{int(time.time() * 1000)}",
-                    "params": [f"{rid}/user-activity", self.username, ["user-typing"]],
+                    "params": [f"{channel}/user-activity", self.username, ["user-typing"]],
                 }
             )
         )
 
-    async def sendmessage(self, rid, message):
+    async def sendmessage(self, channel, message):
         """
-        Sends a message.
+        Sends a message. The REST API is used to ensure delivery as the websocket can sometimes be closed.
 
         Args:
-            rid: room id
+            channel: room id
             message: message to send
+
+        Returns:
+            message id
         """
 
         # Generate unique message ID
-        uid = hashlib.md5(f"{time.time()}:{rid}".encode()).hexdigest()[:12]
-
-        # Use REST API to send message
-        response = await self.client.post(f"{self.baseurl}/api/v1/chat.sendMessage", json={"message": {"_id": uid, "rid": rid, "msg": str(message)}})
-        response.raise_for_status().json()
+        uid = hashlib.md5(f"{time.time()}:{channel}".encode()).hexdigest()[:12]
+
+        # Use REST API to send message, the message id makes retries idempotent
+        await self.request(
+            "POST",
+            f"{self.baseurl}/api/v1/chat.sendMessage",
+            json={"message": {"_id": uid, "rid": channel, "msg": str(message)}},
+            timeout=self.timeout("send"),
+        )
 
         logger.info("Sent response: %s", message)
+
+        return uid
+
+    async def updatemessage(self, channel, uid, message):
+        """
+        Updates the text of a previously sent message.
+
+        Args:
+            channel: room id
+            uid: message id
+            message: new message text
+        """
+
+        await self.request(
+            "POST",
+            f"{self.baseurl}/api/v1/chat.update",
+            json={"roomId": channel, "msgId": uid, "text": str(message)},
+            timeout=self.timeout("update"),
+        )
@@ -0,0 +1,118 @@
+"""
+Scheduler module
+"""
+
+import asyncio
+import logging
+import time
+
+from collections import deque
+
+# Logging configuration
+logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """
+    Schedules incoming messages for processing. Messages are queued per session and processed strictly in order within a session.
+    Different sessions run in parallel up to a global in-flight limit.
+    """
+
+    def __init__(self, handler, reject, inflight=4, depth=10, overflow="drop"):
+        """
+        Creates a new Scheduler.
+
+        Args:
+            handler: async function called with (session, message, received, trace) for each scheduled message, received is the
+                     monotonic time the message was added and trace is the message trace passed to add
+            reject: function called with (session, message) when a message is rejected with the busy overflow policy
+            inflight: maximum number of messages processed concurrently across all sessions
+            depth: maximum number of pending messages per session
+            overflow: policy applied when a session queue is full - drop (drop oldest), busy (reject new) or coalesce (merge into last)
+        """
+
+        if overflow not in ("drop", "busy", "coalesce"):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+
+        self.handler = handler
+        self.reject = reject
+        self.depth = max(depth, 1)
+        self.overflow = overflow
+
+        # Global admission control
+        self.semaphore = asyncio.Semaphore(inflight)
+
+        # Pending (message, received, trace) and processing task per session
+        self.queues, self.workers = {}, {}
+
+        # Number of pending messages across all sessions, updated on the event loop and safe to read from other threads
+        self.pending = 0
+
+    def __len__(self):
+        """
+        Number of pending messages across all sessions.
+
+        Returns:
+            number of pending messages
+        """
+
+        return self.pending
+
+    def add(self, session, message, trace=None):
+        """
+        Adds a message to a session queue. Starts a processing task for the session, if necessary.
+
+        Args:
+            session: session id
+            message: message text
+            trace: message trace, if traced
+        """
+
+        queue = self.queues.setdefault(session, deque())
+
+        # Apply overflow policy when session queue is full
+        if len(queue) >= self.depth:
+            if self.overflow == "busy":
+                logger.warning("Session %s queue full, rejecting message", session)
+                self.reject(session, message)
+                return
+
+            if self.overflow == "coalesce":
+                # Merge message into last pending message
+                queue[-1] = (f"{queue[-1][0]}\n{message}", *queue[-1][1:])
+                return
+
+            logger.warning("Session %s queue full, dropping oldest message", session)
+            queue.popleft()
+            self.pending -= 1
+
+        queue.append((message, time.monotonic(), trace))
+        self.pending += 1
+
+        # Start session worker, if necessary
+        if session not in self.workers:
+            self.workers[session] = asyncio.create_task(self.process(session))
+
+    async def process(self, session):
+        """
+        Processes pending messages for a session in order.
+
+        Args:
+            session: session id
+        """
+
+        queue = self.queues[session]
+
+        try:
+            while queue:
+                # Wait for a global processing slot, messages stay pending in the session queue until a slot is available
+                async with self.semaphore:
+                    message, received, trace = queue.popleft()
+                    self.pending -= 1
+
+                    await self.handler(session, message, received, trace)
+
+        finally:
+            # Release session state once the queue is drained, messages left after a cancellation are no longer pending
+            self.pending -= len(self.queues.pop(session, ()))
+            self.workers.pop(session, None)
@@ -0,0 +1,6 @@
+"""
+Metrics imports
+"""
+
+from .base import Metrics, registry
+from .server import MetricsServer
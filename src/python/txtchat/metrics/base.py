@@ -0,0 +1,240 @@
+"""
+Metrics module
+"""
+
+import bisect
+import threading
+import time
+
+from contextlib import contextmanager
+
+
+class Metrics:
+    """
+    Collects counters, gauges and histograms and renders them in the Prometheus text exposition format.
+    """
+
+    # Default histogram buckets in seconds
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+    def __init__(self, buckets=None):
+        """
+        Creates a new Metrics registry.
+
+        Args:
+            buckets: histogram bucket upper bounds, defaults to BUCKETS
+        """
+
+        self.buckets = tuple(buckets) if buckets else Metrics.BUCKETS
+
+        # (name, labels) -> value
+        self.counters, self.gauges = {}, {}
+
+        # (name, labels) -> [bucket counts, sum, count]
+        self.histograms = {}
+
+        # Functions called before rendering, used to update gauges from current state
+        self.collectors = []
+
+        # Metrics are updated from the event loop and action worker threads
+        self.lock = threading.Lock()
+
+    def increment(self, name, value=1, **labels):
+        """
+        Increments a counter.
+
+        Args:
+            name: metric name
+            value: increment value
+            labels: metric labels
+        """
+
+        key = (name, self.labels(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name, value, **labels):
+        """
+        Sets a gauge value.
+
+        Args:
+            name: metric name
+            value: gauge value
+            labels: metric labels
+        """
+
+        key = (name, self.labels(labels))
+        with self.lock:
+            self.gauges[key] = value
+
+    def observe(self, name, value, **labels):
+        """
+        Adds an observation to a histogram.
+
+        Args:
+            name: metric name
+            value: observed value
+            labels: metric labels
+        """
+
+        key = (name, self.labels(labels))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+
+            histogram = self.histograms[key]
+
+            # Buckets are cumulative when rendered, only count the first matching bucket here
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                histogram[0][index] += 1
+
+            histogram[1] += value
+            histogram[2] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        Context manager that observes the elapsed time of a block in a histogram.
+
+        Args:
+            name: metric name
+            labels: metric labels
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def register(self, collector):
+        """
+        Registers a collector function. Collectors are called before rendering metrics.
+
+        Args:
+            collector: function with no arguments
+        """
+
+        with self.lock:
+            self.collectors.append(collector)
+
+    def unregister(self, collector):
+        """
+        Removes a collector function.
+
+        Args:
+            collector: function previously registered
+        """
+
+        with self.lock:
+            if collector in self.collectors:
+                self.collectors.remove(collector)
+
+    def render(self):
+        """
+        Renders all metrics in the Prometheus text exposition format.
+
+        Returns:
+            metrics text
+        """
+
+        # Run collectors
+        for collector in list(self.collectors):
+            collector()
+
+        lines = []
+        with self.lock:
+            self.rendermetrics(lines, "counter", self.counters)
+            self.rendermetrics(lines, "gauge", self.gauges)
+            self.renderhistograms(lines)
+
+        return "\n".join(lines) + "\n"
+
+    def rendermetrics(self, lines, mtype, metrics):
+        """
+        Renders counter or gauge metrics.
+
+        Args:
+            lines: output lines
+            mtype: metric type
+            metrics: metrics dictionary
+        """
+
+        current = None
+        for (name, labels), value in sorted(metrics.items()):
+            if name != current:
+                lines.append(f"# TYPE {name} {mtype}")
+                current = name
+
+            lines.append(f"{name}{self.format(labels)} {value}")
+
+    def renderhistograms(self, lines):
+        """
+        Renders histogram metrics.
+
+        Args:
+            lines: output lines
+        """
+
+        current = None
+        for (name, labels), (counts, total, count) in sorted(self.histograms.items()):
+            if name != current:
+                lines.append(f"# TYPE {name} histogram")
+                current = name
+
+            cumulative = 0
+            for bound, value in zip(self.buckets, counts):
+                cumulative += value
+                lines.append(f"{name}_bucket{self.format(labels + (('le', str(bound)),))} {cumulative}")
+
+            lines.append(f"{name}_bucket{self.format(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{self.format(labels)} {total}")
+            lines.append(f"{name}_count{self.format(labels)} {count}")
+
+    def labels(self, labels):
+        """
+        Converts a labels dictionary to a hashable tuple.
+
+        Args:
+            labels: labels dictionary
+
+        Returns:
+            sorted tuple of (name, value)
+        """
+
+        return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+    def format(self, labels):
+        """
+        Formats labels for output.
+
+        Args:
+            labels: tuple of (name, value)
+
+        Returns:
+            formatted labels
+        """
+
+        if not labels:
+            return ""
+
+        values = ",".join(f'{key}="{self.escape(value)}"' for key, value in labels)
+        return f"{{{values}}}"
+
+    def escape(self, value):
+        """
+        Escapes a label value.
+
+        Args:
+            value: label value
+
+        Returns:
+            escaped value
+        """
+
+        return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# Default metrics registry
+registry = Metrics()
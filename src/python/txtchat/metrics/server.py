@@ -0,0 +1,87 @@
+"""
+Server module
+"""
+
+import logging
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .base import registry
+
+# Logging configuration
+logger = logging.getLogger(__name__)
+
+
+class MetricsServer:
+    """
+    Lightweight HTTP server that exposes metrics at /metrics. The server runs in a background thread.
+    """
+
+    def __init__(self, host="0.0.0.0", port=9100, metrics=None):
+        """
+        Creates a new MetricsServer.
+
+        Args:
+            host: host to bind
+            port: port to bind
+            metrics: metrics registry, defaults to the default registry
+        """
+
+        self.host = host
+        self.port = port
+        self.metrics = metrics if metrics else registry
+
+        self.server, self.thread = None, None
+
+    def start(self):
+        """
+        Starts the server in a background thread.
+        """
+
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            """
+            Metrics request handler.
+            """
+
+            # pylint: disable=C0103
+            def do_GET(self):
+                """
+                Handles a GET request.
+                """
+
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+
+                body = metrics.render().encode("utf-8")
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            # pylint: disable=W0622
+            def log_message(self, format, *args):
+                """
+                Disables per-request logging.
+                """
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True)
+        self.thread.start()
+
+        logger.info("Metrics available at http://%s:%d/metrics", self.host, self.port)
+
+    def stop(self):
+        """
+        Stops the server.
+        """
+
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server, self.thread = None, None
@@ -7,6 +7,10 @@ import urllib.parse
 
 from txtai.pipeline import Pipeline
 
+from ..cache import MemoryCache
+from ..metrics import registry
+from ..tracing import tracer
+
 # Logging configuration
 logger = logging.getLogger(__name__)
 
@@ -17,20 +21,38 @@ class Wikisearch(Pipeline):
     as context to a Large Language Model (LLM) prompt.
     """
 
-    def __init__(self, application):
+    def __init__(self, application, mode="fallback", minscore=None, cache=None):
         """
         Creates a new Wikisearch instance.
 
         Args:
             application: application instance
+            mode: fallback (default) runs a full search only if the top 1% search has no answer, scores runs both searches in a single
+                  pass and selects the context using retrieval scores before running the LLM
+            minscore: minimum top 1% search score required to use that context, required with scores mode. Scores depend on the
+                      embeddings model, so there isn't a default that works for every index.
+            cache: search result cache configuration, True for defaults, None (default) disables caching
         """
 
         # Application instance
         self.application = application
 
+        # Context selection mode
+        if mode == "scores" and minscore is None:
+            raise ValueError("Wikisearch scores mode requires minscore")
+
+        self.mode = mode
+        self.minscore = minscore
+
+        # Search result cache, (text, low, high) -> context rows
+        self.cache = MemoryCache(cache if isinstance(cache, dict) else {}) if cache else None
+
+        # Metric labels, agents add provider and action labels
+        self.labels = {"pipeline": "wikisearch"}
+
     def __call__(self, texts, **kwargs):
         """
-        Executes a multi-step RAG action for each element in texts.
+        Executes a multi-step RAG action for each element in texts. All texts are processed as a single batch.
 
         Args:
             texts: input texts
@@ -40,70 +62,132 @@ class Wikisearch(Pipeline):
             responses
         """
 
-        responses = []
-        for text in texts:
-            # First try top 1%
-            response = self.rag(text, 0.99, 1.0)
+        if self.mode == "scores":
+            # Run top 1% and full queries together, then select context before running the LLM
+            results = self.search([query for text in texts for query in [(text, 0.99, 1.0), (text, 0.00, 0.99)]])
 
-            # Do full query if no answer
-            if not response:
-                response = self.rag(text, 0.00, 0.99)
+            contexts = []
+            for top, full in zip(results[::2], results[1::2]):
+                contexts.append(top if top and max(x["score"] for x in top) >= self.minscore else full)
 
-            # Format responses
-            responses.append(self.render(response))
+            responses = self.generate(texts, contexts)
+        else:
+            # First try top 1%
+            responses = self.rag(texts, 0.99, 1.0)
 
-        return responses
+            # Do full query for texts with no answer
+            missing = [x for x, response in enumerate(responses) if not response["answer"]]
+            if missing:
+                for x, response in zip(missing, self.rag([texts[x] for x in missing], 0.00, 0.99)):
+                    responses[x] = response
 
-    def rag(self, text, low, high):
+        # Format responses
+        return [self.render(response) for response in responses]
+
+    def rag(self, texts, low, high):
         """
-        Runs a RAG pipeline. Low and high percentile bounds are used to filter results from the Wikipedia index.
+        Runs a RAG pipeline for a batch of texts. Low and high percentile bounds are used to filter results from the Wikipedia index.
 
         Args:
-            text: input query text
+            texts: input query texts
             low: lower percentile bound
             high: upper percentile bound
 
         Returns:
-            response
+            responses
         """
 
-        # Get rag pipeline
-        rag = self.application.pipelines["rag"]
+        # Generate context
+        contexts = self.search([(text, low, high) for text in texts])
 
-        # Build similar clause
-        clause = self.clause(text)
+        # Run RAG pipeline
+        return self.generate(texts, contexts)
 
-        # Build SQL query
-        query = f"SELECT id, text, score, percentile FROM txtai WHERE similar({clause}) AND percentile >= {low} AND percentile <= {high} limit 10"
-        logger.info(query)
+    def search(self, queries):
+        """
+        Runs a list of queries as a single batch search. Low and high percentile bounds are used to filter results from the Wikipedia index.
+        Cached results are returned when available.
 
-        # Generate context
-        context = self.application.search(query)
+        Args:
+            queries: list of (text, low, high)
 
-        # Run RAG pipeline
-        response = rag(text, [x["text"] for x in context], maxlength=2048)
+        Returns:
+            list of context rows per query
+        """
 
-        # Format and return response
-        reference = response["reference"]
-        response["reference"] = context[reference]["id"] if reference is not None else reference
-        return response
+        # Get cached results
+        results = [self.cache.get(query) if self.cache else None for query in queries]
+        if self.cache:
+            for result in results:
+                registry.increment("txtchat_cache_requests_total", cache="search", result="miss" if result is None else "hit", **self.labels)
+
+        # Queries to run
+        missing = [x for x, result in enumerate(results) if result is None]
+        if missing:
+            # Build SQL queries, query text is passed as a bind parameter
+            sql, parameters = [], []
+            for x in missing:
+                text, low, high = queries[x]
+
+                query = (
+                    f"SELECT id, text, score, percentile FROM txtai WHERE similar(:text) AND percentile >= {low} AND percentile <= {high} limit 10"
+                )
+                logger.info("%s [%s]", query, text)
+
+                sql.append(query)
+                parameters.append({"text": text})
 
-    def clause(self, text):
+            # Run search
+            with registry.timer("txtchat_search_seconds", **self.labels), tracer.span("search"):
+                search = self.application.batchsearch(sql, parameters=parameters)
+
+            for x, result in zip(missing, search):
+                results[x] = result
+
+                # Cache result
+                if self.cache:
+                    self.cache.put(queries[x], result)
+
+        return results
+
+    def generate(self, texts, contexts):
         """
-        Builds a similar clause using text.
+        Runs the RAG pipeline for a batch of texts, each with its own search context. This matches running the RAG pipeline
+        separately for each text but runs the LLM once for the whole batch.
 
         Args:
-            text: input text
+            texts: input query texts
+            contexts: context rows per text
 
         Returns:
-            text for similar clause
+            responses
         """
 
-        # Remove all single quotes
-        text = text.replace("'", "")
+        # Get rag pipeline
+        rag = self.application.pipelines["rag"]
+
+        # Select best matching context segments for each text
+        topns = []
+        with tracer.span("context"):
+            for text, context in zip(texts, contexts):
+                matches = rag.query([text], [x["text"] for x in context])[0] if context else []
+
+                # Order top n matches using the original context order
+                topns.append(sorted(sorted(matches, key=lambda y: y[2], reverse=True)[: rag.context], key=lambda y: y[0]))
+
+        # Run LLM over all (question, context) pairs
+        with registry.timer("txtchat_llm_seconds", **self.labels), tracer.span("llm"):
+            answers = rag.answers(texts, [rag.separator.join(x for _, x, _ in topn) for topn in topns], maxlength=2048)
 
-        # Wrap clause in single quotes
-        return f"'{text}'"
+        # Apply RAG output formatting
+        responses = rag.apply(texts, [None] * len(texts), texts, answers, topns, [None] * len(texts))
+
+        # Resolve references to Wikipedia article ids
+        for response, context in zip(responses, contexts):
+            reference = response["reference"]
+            response["reference"] = context[reference]["id"] if reference is not None else reference
+
+        return responses
 
     def render(self, response):
         """
@@ -117,6 +201,10 @@ class Wikisearch(Pipeline):
         answer = response["answer"]
         reference = response["reference"]
 
+        # No reference available
+        if reference is None:
+            return answer
+
         # Resolve full reference URL path
         path = urllib.parse.quote(reference.replace(" ", "_"))
         reference = f"https://en.wikipedia.org/wiki/{path}"
@@ -0,0 +1,6 @@
+"""
+Tracing imports
+"""
+
+from .base import Trace, Tracer, tracer
+from .profiler import Profiler, profiler
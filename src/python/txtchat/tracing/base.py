@@ -0,0 +1,254 @@
+"""
+Tracing module
+"""
+
+import contextvars
+import functools
+import inspect
+import logging
+import random
+import time
+import uuid
+
+from contextlib import contextmanager
+
+# Logging configuration
+logger = logging.getLogger(__name__)
+
+
+class Trace:
+    """
+    Trace of a single message. Stores named spans as offsets and durations relative to when the trace started.
+    """
+
+    def __init__(self):
+        """
+        Creates a new Trace.
+        """
+
+        # Correlation id
+        self.uid = uuid.uuid4().hex[:12]
+
+        # Start time and list of (name, offset, duration)
+        self.start, self.spans = time.monotonic(), []
+
+    def __str__(self):
+        """
+        Formats spans in start order.
+
+        Returns:
+            spans as text
+        """
+
+        return " ".join(f"{name}=+{offset:.3f}/{duration:.3f}s" for name, offset, duration in sorted(self.spans, key=lambda x: x[1]))
+
+    def add(self, name, start, end):
+        """
+        Adds a span.
+
+        Args:
+            name: span name
+            start: monotonic start time
+            end: monotonic end time
+        """
+
+        self.spans.append((name, start - self.start, end - start))
+
+    def elapsed(self):
+        """
+        Time since this trace started.
+
+        Returns:
+            elapsed time in seconds
+        """
+
+        return time.monotonic() - self.start
+
+
+class Tracer:
+    """
+    Creates per-message traces. Active traces are stored in a context variable, so spans recorded anywhere on the message path,
+    including action worker threads, are added to the right trace. Correlation ids are added to log records.
+    """
+
+    def __init__(self):
+        """
+        Creates a new Tracer. Tracing is disabled until configured.
+        """
+
+        # Fraction of messages to trace and minimum trace duration in seconds to log
+        self.sample, self.slow = 0.0, 0.0
+
+        # Active traces in the current context
+        self.current = contextvars.ContextVar("traces", default=())
+
+        # Log record factory, set when installed
+        self.factory = None
+
+    def configure(self, config):
+        """
+        Configures tracing.
+
+        Args:
+            config: tracing configuration
+        """
+
+        self.sample = config.get("sample", 1.0)
+        self.slow = config.get("slow", 0.0)
+
+        logger.info("Tracing %.0f%% of messages", self.sample * 100)
+
+    def install(self):
+        """
+        Adds a trace attribute with the active correlation ids to all log records. Log formats can then include %(trace)s.
+        """
+
+        if self.factory:
+            return
+
+        self.factory = logging.getLogRecordFactory()
+
+        def factory(*args, **kwargs):
+            record = self.factory(*args, **kwargs)
+            traces = self.current.get()
+            record.trace = ",".join(trace.uid for trace in traces) if traces else "-"
+            return record
+
+        logging.setLogRecordFactory(factory)
+
+    def start(self):
+        """
+        Starts a new trace, if this message is sampled.
+
+        Returns:
+            Trace or None
+        """
+
+        return Trace() if self.sample and random.random() < self.sample else None
+
+    def traces(self):
+        """
+        Gets the active traces.
+
+        Returns:
+            tuple of active traces
+        """
+
+        return self.current.get()
+
+    @contextmanager
+    def activate(self, *traces):
+        """
+        Context manager that makes traces active for a block. Blocks can run on behalf of multiple traces, for example a batch
+        of messages.
+
+        Args:
+            traces: traces to activate, None values are ignored
+        """
+
+        token = self.current.set(tuple(trace for trace in traces if trace))
+        try:
+            yield
+        finally:
+            self.current.reset(token)
+
+    @contextmanager
+    def span(self, name):
+        """
+        Context manager that records a block as a span on all active traces.
+
+        Args:
+            name: span name
+        """
+
+        traces = self.current.get()
+        if not traces:
+            yield
+            return
+
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(traces, name, start)
+
+    def wrap(self, name, function):
+        """
+        Wraps function to record each call as a span. Generator outputs are passed through, the span ends when the generator
+        is exhausted or closed.
+
+        Args:
+            name: span name
+            function: function to wrap
+
+        Returns:
+            wrapped function
+        """
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            # Calls outside of a trace run unchanged
+            traces = self.current.get()
+            if not traces:
+                return function(*args, **kwargs)
+
+            start, outputs = time.monotonic(), None
+            try:
+                outputs = function(*args, **kwargs)
+            finally:
+                if not inspect.isgenerator(outputs):
+                    self.record(traces, name, start)
+
+            return self.generator(traces, name, start, outputs) if inspect.isgenerator(outputs) else outputs
+
+        return wrapper
+
+    def generator(self, traces, name, start, outputs):
+        """
+        Passes through generator outputs and records a span once the generator finishes.
+
+        Args:
+            traces: traces to add the span to
+            name: span name
+            start: monotonic start time
+            outputs: generator
+
+        Returns:
+            generator outputs
+        """
+
+        try:
+            yield from outputs
+        finally:
+            self.record(traces, name, start)
+
+    def record(self, traces, name, start):
+        """
+        Adds a span that ends now to traces.
+
+        Args:
+            traces: traces to add the span to
+            name: span name
+            start: monotonic start time
+        """
+
+        end = time.monotonic()
+        for trace in traces:
+            trace.add(name, start, end)
+
+    def finish(self, trace):
+        """
+        Finishes a trace and logs it if it ran at least the slow trace threshold.
+
+        Args:
+            trace: Trace or None
+        """
+
+        if trace:
+            elapsed = trace.elapsed()
+            if elapsed >= self.slow:
+                logger.info("Trace %s took %.3fs: %s", trace.uid, elapsed, trace)
+
+
+# Default tracer
+tracer = Tracer()
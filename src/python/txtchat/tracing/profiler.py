@@ -0,0 +1,109 @@
+"""
+Profiler module
+"""
+
+import cProfile
+import io
+import logging
+import pstats
+import threading
+import time
+
+# Logging configuration
+logger = logging.getLogger(__name__)
+
+
+class Profiler:
+    """
+    Profiles the next N actions with cProfile. Statistics for all profiled actions are combined and written to a file that can be
+    loaded with pstats or a profile viewer. Only one action is profiled at a time, actions running concurrently are not profiled.
+    """
+
+    def __init__(self):
+        """
+        Creates a new Profiler. Profiling is off until started.
+        """
+
+        # Active profile, output path and number of actions left to profile
+        self.profile, self.path, self.remaining = None, None, 0
+
+        # True while an action is being profiled
+        self.running = False
+
+        # Profiler state is shared by action worker threads
+        self.lock = threading.Lock()
+
+    def __call__(self, function, *args, **kwargs):
+        """
+        Runs function, with profiling if enabled.
+
+        Args:
+            function: function to run
+            args: positional arguments
+            kwargs: keyword arguments
+
+        Returns:
+            function result
+        """
+
+        profile = self.acquire()
+        if not profile:
+            return function(*args, **kwargs)
+
+        try:
+            return profile.runcall(function, *args, **kwargs)
+        finally:
+            self.release()
+
+    def start(self, count=10, path=None):
+        """
+        Profiles the next count actions.
+
+        Args:
+            count: number of actions to profile
+            path: output path, defaults to txtchat-<timestamp>.prof in the current directory
+        """
+
+        with self.lock:
+            self.profile, self.remaining = cProfile.Profile(), count
+            self.path = path if path else f"txtchat-{int(time.time())}.prof"
+
+        logger.info("Profiling next %d actions to %s", count, self.path)
+
+    def acquire(self):
+        """
+        Reserves the profiler for an action.
+
+        Returns:
+            cProfile.Profile if this action should be profiled, None otherwise
+        """
+
+        with self.lock:
+            if self.remaining and not self.running:
+                self.running = True
+                return self.profile
+
+        return None
+
+    def release(self):
+        """
+        Releases the profiler after an action. Writes statistics once the requested number of actions is profiled.
+        """
+
+        with self.lock:
+            self.running = False
+            self.remaining -= 1
+
+            if not self.remaining:
+                self.profile.dump_stats(self.path)
+
+                # Log top functions by cumulative time
+                output = io.StringIO()
+                pstats.Stats(self.profile, stream=output).sort_stats("cumulative").print_stats(15)
+                logger.info("Profile written to %s\n%s", self.path, output.getvalue())
+
+                self.profile = None
+
+
+# Default profiler
+profiler = Profiler()